@@ -27,6 +27,7 @@ from app.schemas.content import (
     CaseSolution as CaseSolutionSchema,
     SoftSkillsProfile as SoftSkillsProfileSchema,
 )
+from app.services.plan_service import plan_service
 from app.schemas.plan import (
     DevelopmentPlan as DevelopmentPlanSchema,
     MaterialItem,
@@ -37,7 +38,6 @@ from app.schemas.plan import (
 
 router = APIRouter()
 
-
 def _ensure_plan_content(content: Optional[dict]) -> dict:
     base = {
         "weaknesses": [],
@@ -490,6 +490,7 @@ async def admin_add_material(
         raise HTTPException(status_code=400, detail="Материал с таким id уже существует")
     material_payload = jsonable_encoder(material_in)
     materials.append(material_payload)
+    plan_service.reset_tracking_cache(content)
     plan.content = jsonable_encoder(content)
     flag_modified(plan, "content")
     await db.commit()
@@ -521,6 +522,7 @@ async def admin_update_material(
         material["skill"] = material_in.skill
     if material_in.difficulty is not None:
         material["difficulty"] = material_in.difficulty
+    plan_service.reset_tracking_cache(content)
     plan.content = jsonable_encoder(content)
     flag_modified(plan, "content")
     await db.commit()
@@ -542,6 +544,7 @@ async def admin_delete_material(
     if index is None:
         raise HTTPException(status_code=404, detail="Материал не найден")
     materials.pop(index)
+    plan_service.reset_tracking_cache(content)
     plan.content = jsonable_encoder(content)
     flag_modified(plan, "content")
     await db.commit()
@@ -1,6 +1,7 @@
 from typing import Optional
 from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
+from pydantic import PrivateAttr
 from pydantic_settings import BaseSettings
 
 
@@ -21,6 +22,10 @@ class Settings(BaseSettings):
     DB_CONNECT_TIMEOUT_SECONDS: int = 15
     DB_POOL_PRE_PING: bool = True
     DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_USE_LIFO: bool = True
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_QUERY_CACHE_SIZE: int = 1200
     DB_ECHO_SQL: bool = False
     DB_STARTUP_MAX_RETRIES: int = 10
     DB_STARTUP_RETRY_DELAY_SECONDS: float = 2.0
@@ -41,15 +46,29 @@ class Settings(BaseSettings):
     YANDEX_FOLDER_ID: str = ""
     YANDEX_API_KEY: str = ""
 
+    # Completed free-text analyses are reused for identical (normalized) input
+    LLM_ANALYSIS_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    LLM_ANALYSIS_CACHE_MAX_ENTRIES: int = 1024
+    # Background analyses waiting on the LLM at the same time (per process)
+    LLM_MAX_INFLIGHT: int = 8
+
     DEFAULT_ADMIN_EMAIL: str = "admin123@admin123.com"
     DEFAULT_ADMIN_PASSWORD: str = "admin123"
 
     # Development plan generation
     MIN_ANALYSES_FOR_PLAN: int = 3
 
+    # Whether DATABASE_URL or a POSTGRES_* value was set by the environment or .env,
+    # as opposed to DATABASE_URL being filled from the built-in defaults.
+    _database_configured: bool = PrivateAttr(default=False)
+
     class Config:
         env_file = ".env"
 
+    @property
+    def database_configured(self) -> bool:
+        return self._database_configured
+
     @staticmethod
     def _to_asyncpg_scheme(raw_url: str) -> str:
         value = raw_url.strip()
@@ -103,6 +122,9 @@ class Settings(BaseSettings):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
+        self._database_configured = bool(self.DATABASE_URL) or any(
+            name.startswith("POSTGRES_") for name in self.model_fields_set
+        )
         if not self.DATABASE_URL:
             self.DATABASE_URL = (
                 f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
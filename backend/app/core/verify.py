@@ -0,0 +1,257 @@
+"""
+Setup checks shared by verify_setup.py and the ``GET /health/setup`` probe.
+
+Checks:
+1. PostgreSQL connectivity
+2. Environment variables
+3. Required dependencies
+"""
+
+import asyncio
+import importlib.util
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from io import StringIO
+from typing import Optional, TextIO
+
+# app.core.config (and pydantic_settings behind it) is imported inside the checks
+# that need it, so importing this module stays cheap.
+
+
+@dataclass(slots=True)
+class VerifyResult:
+    """Outcome of the setup checks."""
+
+    deps_ok: bool
+    env_ok: bool
+    # None when the probe was skipped because no database is configured.
+    db_ok: Optional[bool]
+
+    @property
+    def ok(self) -> bool:
+        return self.deps_ok and self.env_ok and self.db_ok is True
+
+
+def status_marker(ok: Optional[bool]) -> str:
+    """Return an ASCII-safe status marker; ``None`` marks a skipped check."""
+    if ok is None:
+        return "[SKIP]"
+    return "[OK]" if ok else "[FAIL]"
+
+
+# Values that mean "left at the .env.example default" rather than configured.
+_INVALID_PLACEHOLDERS = frozenset(
+    {"", "your_api_key", "your_folder_id", "YOUR_SUPER_SECRET_KEY_CHANGE_ME"}
+)
+_INVALID_OPTIONAL_PLACEHOLDERS = frozenset({"", "your_api_key", "your_folder_id"})
+
+
+# Upper bound for the whole probe (connect + SELECT 1 + close), so an unreachable
+# host fails the check quickly instead of hanging on TCP retries.
+_DB_PROBE_TIMEOUT_SECONDS = 3.0
+
+
+async def verify_database(out: Optional[TextIO] = None) -> Optional[bool]:
+    """
+    Verify PostgreSQL database connectivity.
+
+    Returns ``None`` without connecting when neither DATABASE_URL nor any
+    POSTGRES_* value is configured (the URL would only be the built-in default).
+    """
+    from app.core.config import settings
+
+    out = out or sys.stdout
+    print("\n=== Database Verification ===", file=out)
+    if not settings.database_configured:
+        print(
+            f"{status_marker(None)} DATABASE_URL / POSTGRES_* not configured; connection not attempted",
+            file=out,
+        )
+        return None
+    print(f"DATABASE_URL: {settings.DATABASE_URL}", file=out)
+
+    async def _probe() -> None:
+        # A single SELECT 1 does not need the SQLAlchemy engine; asyncpg takes the
+        # plain libpq-style DSN and the same SSL flag as app/db/session.py.
+        import asyncpg
+
+        dsn = settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+        connect_kwargs = {"ssl": True} if settings.DATABASE_SSL is True else {}
+        conn = await asyncpg.connect(
+            dsn,
+            timeout=_DB_PROBE_TIMEOUT_SECONDS,
+            server_settings={"application_name": "verify_setup"},
+            **connect_kwargs,
+        )
+        try:
+            await conn.fetchval("SELECT 1")
+        finally:
+            await conn.close()
+
+    try:
+        await asyncio.wait_for(_probe(), timeout=_DB_PROBE_TIMEOUT_SECONDS)
+        print(f"{status_marker(True)} PostgreSQL connection successful!", file=out)
+        return True
+
+    except Exception as exc:
+        if isinstance(exc, asyncio.TimeoutError):
+            reason = f"no response within {_DB_PROBE_TIMEOUT_SECONDS:g} seconds"
+        else:
+            reason = str(exc)
+        print(f"{status_marker(False)} PostgreSQL connection failed: {reason}", file=out)
+        print("\nTo fix this:", file=out)
+        print("1. Ensure PostgreSQL is installed and running", file=out)
+        print("2. Check your DATABASE_URL in .env file", file=out)
+        print("3. For local development: docker-compose up -d", file=out)
+        print("4. For production: Use managed PostgreSQL from Render/Railway/Vercel", file=out)
+        return False
+
+
+def _mask(value: str) -> str:
+    """Show only the ends of a secret value."""
+    if len(value) <= 8:
+        return "***"
+    return value[:4] + "..." + value[-4:]
+
+
+def verify_environment_variables(out: Optional[TextIO] = None) -> bool:
+    """Verify required environment variables are set."""
+    from app.core.config import settings
+
+    out = out or sys.stdout
+    print("\n=== Environment Variables Verification ===", file=out)
+
+    # (name, value, sensitive): sensitive values are printed masked.
+    required_vars = [
+        ("DATABASE_URL", settings.DATABASE_URL, False),
+        ("SECRET_KEY", settings.SECRET_KEY, True),
+    ]
+    optional_vars = [
+        ("YANDEX_API_KEY", settings.YANDEX_API_KEY, True),
+        ("YANDEX_FOLDER_ID", settings.YANDEX_FOLDER_ID, True),
+    ]
+
+    all_set = True
+    for var_name, var_value, sensitive in required_vars:
+        if not var_value or var_value in _INVALID_PLACEHOLDERS:
+            print(f"{status_marker(False)} {var_name}: Not properly configured", file=out)
+            all_set = False
+            continue
+        shown = _mask(var_value) if sensitive else var_value
+        print(f"{status_marker(True)} {var_name}: {shown}", file=out)
+
+    for var_name, var_value, sensitive in optional_vars:
+        if not var_value or var_value in _INVALID_OPTIONAL_PLACEHOLDERS:
+            print(f"[WARN] {var_name}: Not configured (optional)", file=out)
+            continue
+        shown = _mask(var_value) if sensitive else var_value
+        print(f"{status_marker(True)} {var_name}: {shown}", file=out)
+
+    if not all_set:
+        print("\nPlease update your .env file with proper values:", file=out)
+        print("- DATABASE_URL: PostgreSQL connection string", file=out)
+        print("- SECRET_KEY: A secure random string for JWT tokens", file=out)
+    else:
+        print("\nOptional variables:", file=out)
+        print("- YANDEX_API_KEY / YANDEX_FOLDER_ID: needed only for Yandex LLM calls", file=out)
+
+    return all_set
+
+
+def verify_dependencies(deep: bool = False, out: Optional[TextIO] = None) -> bool:
+    """
+    Verify required Python packages are installed.
+
+    By default packages are only located on sys.path, without running their
+    top-level code; ``deep=True`` also imports each one to catch load-time errors.
+    """
+    out = out or sys.stdout
+    print("\n=== Dependencies Verification ===", file=out)
+
+    required_packages = [
+        "fastapi",
+        "sqlalchemy",
+        "asyncpg",
+        "langchain",
+        "langchain_community",
+        "requests",
+        "pydantic_settings",
+    ]
+    optional_packages = [
+        "hypothesis",
+        "yandex_chain",
+        "yandexcloud",
+    ]
+
+    all_installed = True
+
+    def _check_module(module_name: str) -> tuple[bool, str]:
+        try:
+            spec = importlib.util.find_spec(module_name)
+        except (ImportError, ValueError) as exc:
+            return False, str(exc)
+        if spec is None:
+            return False, "not found"
+        if not deep:
+            return True, ""
+        try:
+            __import__(module_name)
+            return True, ""
+        except Exception as exc:  # pragma: no cover - defensive diagnostic path
+            return False, str(exc)
+
+    # Probes mostly wait on filesystem lookups, so they run side by side; results
+    # are printed afterwards in the declared order.
+    packages = required_packages + optional_packages
+    with ThreadPoolExecutor(max_workers=len(packages)) as executor:
+        results = dict(zip(packages, executor.map(_check_module, packages)))
+
+    for package in required_packages:
+        ok, reason = results[package]
+        if ok:
+            print(f"{status_marker(True)} {package}: Installed", file=out)
+        else:
+            print(f"{status_marker(False)} {package}: {reason}", file=out)
+            all_installed = False
+
+    for package in optional_packages:
+        ok, reason = results[package]
+        if ok:
+            print(f"{status_marker(True)} {package}: Installed (optional)", file=out)
+        else:
+            print(f"[WARN] {package}: {reason} (optional)", file=out)
+
+    if not all_installed:
+        print("\nTo install missing dependencies:", file=out)
+        print("pip install -r requirements.txt", file=out)
+
+    return all_installed
+
+
+async def verify(deep: bool = False, out: Optional[TextIO] = None) -> VerifyResult:
+    """
+    Run all checks and return their outcome.
+
+    The per-check report is written to ``out`` when given and discarded
+    otherwise; verify_setup.py prints it, ``GET /health/setup`` only returns
+    the flags.
+    """
+    # The checks are independent, so the database handshake overlaps with the
+    # dependency probes. Each check writes to its own buffer, appended to ``out``
+    # in a fixed order once all of them are done.
+    buffers = [StringIO(), StringIO(), StringIO()]
+    results = await asyncio.gather(
+        asyncio.to_thread(verify_dependencies, deep, buffers[0]),
+        asyncio.to_thread(verify_environment_variables, buffers[1]),
+        verify_database(buffers[2]),
+        return_exceptions=True,
+    )
+    if out is not None:
+        for buffer, result in zip(buffers, results):
+            out.write(buffer.getvalue())
+            if isinstance(result, BaseException):
+                print(f"{status_marker(False)} Check crashed: {result}", file=out)
+    deps_ok, env_ok = (result is True for result in results[:2])
+    db_ok = None if results[2] is None else results[2] is True
+    return VerifyResult(deps_ok=deps_ok, env_ok=env_ok, db_ok=db_ok)
@@ -1,24 +1,37 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
 from app.db.base import Base  # Import Base
 
 
 connect_args = {}
+pool_options = {}
 if settings.DATABASE_URL.startswith("postgresql+asyncpg://"):
     connect_args["timeout"] = int(settings.DB_CONNECT_TIMEOUT_SECONDS)
     if settings.DATABASE_SSL is True:
         connect_args["ssl"] = True
+    # LIFO hands out the most recently used connection (warm asyncpg statement
+    # cache) and lets idle overflow connections age out. QueuePool-only option.
+    pool_options["pool_use_lifo"] = bool(settings.DB_POOL_USE_LIFO)
+    # One engine (and pool) per process is shared by requests and background tasks;
+    # sized explicitly so analysis bursts queue on the pool instead of reconnecting.
+    pool_options["poolclass"] = AsyncAdaptedQueuePool
+    pool_options["pool_size"] = int(settings.DB_POOL_SIZE)
+    pool_options["max_overflow"] = int(settings.DB_MAX_OVERFLOW)
 
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=bool(settings.DB_ECHO_SQL),
+    # Compiled SQL cache shared by all sessions; sized above the default (500) so the
+    # per-request and background-task statements are not evicted under a mixed load.
+    query_cache_size=int(settings.DB_QUERY_CACHE_SIZE),
     pool_pre_ping=bool(settings.DB_POOL_PRE_PING),
     pool_recycle=int(settings.DB_POOL_RECYCLE_SECONDS),
     connect_args=connect_args,
+    **pool_options,
 )
 
-AsyncSessionLocal = sessionmaker(
+AsyncSessionLocal = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
@@ -2,11 +2,14 @@ import asyncio
 import json
 import logging
 import os
+import time
 
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import select, func, text
+from fastapi.responses import JSONResponse
+from sqlalchemy import inspect, select, func, text
 from app.core.config import settings
+from app.core.verify import verify
 from app.core.logging_config import setup_logging
 from app.api.api import api_router
 from app.db.session import engine
@@ -150,6 +153,33 @@ async def repair_json_encoding_middleware(request: Request, call_next):
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
+def _create_missing_indexes(sync_conn) -> None:
+    # create_all only adds indexes together with new tables, so indexes declared on
+    # existing models would otherwise never reach an already provisioned database.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+def _add_missing_columns(sync_conn) -> None:
+    # Same story for columns added to existing models: create_all leaves tables that
+    # already exist untouched, so add any declared column the database is missing.
+    inspector = inspect(sync_conn)
+    ddl_compiler = sync_conn.dialect.ddl_compiler(sync_conn.dialect, None)
+    preparer = sync_conn.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            sync_conn.execute(
+                text(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {ddl_compiler.get_column_specification(column)}"
+                )
+            )
+
+
 async def _initialize_database() -> None:
     max_retries = max(1, int(settings.DB_STARTUP_MAX_RETRIES))
     retry_delay = max(0.1, float(settings.DB_STARTUP_RETRY_DELAY_SECONDS))
@@ -161,6 +191,8 @@ async def _initialize_database() -> None:
                 # Safe for existing DB: creates missing tables only.
                 async with engine.begin() as conn:
                     await conn.run_sync(Base.metadata.create_all)
+                    await conn.run_sync(_add_missing_columns)
+                    await conn.run_sync(_create_missing_indexes)
             else:
                 async with engine.connect() as conn:
                     await conn.execute(text("SELECT 1"))
@@ -312,3 +344,27 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+# The setup checks open a database connection and probe packages on threads, so
+# probes within this window reuse the last result kept on app.state.
+_SETUP_VERIFY_CACHE_TTL_SECONDS = 5.0
+
+@app.get("/health/setup")
+async def setup_health_check():
+    """Run the verify_setup.py checks; 503 when any of them fails."""
+    now = time.monotonic()
+    cached = getattr(app.state, "setup_verify", None)
+    if cached is None or now - cached[0] > _SETUP_VERIFY_CACHE_TTL_SECONDS:
+        cached = (now, await verify())
+        app.state.setup_verify = cached
+    result = cached[1]
+    # db_ok is null when the database probe was skipped.
+    return JSONResponse(
+        status_code=200 if result.ok else 503,
+        content={
+            "ok": result.ok,
+            "deps_ok": result.deps_ok,
+            "env_ok": result.env_ok,
+            "db_ok": result.db_ok,
+        },
+    )
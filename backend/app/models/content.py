@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, JSON, Text, Float, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, JSON, Text, Float, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base_class import Base
@@ -11,6 +11,7 @@ class Test(Base):
     description = Column(Text)
     type = Column(String) # 'quiz', 'simulation', 'case'
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
     
     questions = relationship("Question", back_populates="test", cascade="all, delete-orphan")
 
@@ -28,6 +29,9 @@ class Question(Base):
 
 class UserTestResult(Base):
     __tablename__ = "user_test_results"
+    __table_args__ = (
+        Index("ix_user_test_results_user_test_completed", "user_id", "test_id", "completed_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -47,6 +51,9 @@ class UserTestResult(Base):
 
 class CaseSolution(Base):
     __tablename__ = "case_solutions"
+    __table_args__ = (
+        Index("ix_case_solutions_user_test_created", "user_id", "test_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, JSON, DateTime, Float, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, JSON, DateTime, Float, Boolean, Index, false
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base_class import Base
@@ -81,3 +81,16 @@ class DevelopmentPlan(Base):
     content = Column(JSON) 
     
     user = relationship("User", backref="development_plans")
+
+    # Active-plan lookups filter on user_id and is_archived = false and order by
+    # generated_at DESC; the partial index serves them without a sort. Its leading
+    # user_id column also covers the unordered archive lookup on regeneration, so no
+    # separate (user_id) WHERE NOT is_archived index is needed.
+    __table_args__ = (
+        Index(
+            "ix_development_plans_user_active_generated",
+            user_id,
+            generated_at.desc(),
+            postgresql_where=is_archived == false(),
+        ),
+    )
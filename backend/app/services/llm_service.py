@@ -3,13 +3,15 @@ LLM Service for analyzing user responses and generating development plans.
 Uses Yandex GPT through LangChain for structured prompts and response parsing.
 """
 
+import asyncio
+import hashlib
 import json
 import logging
 import time
 import uuid
-from typing import Dict, Any, List, Optional
+from typing import Awaitable, Callable, Dict, Any, Hashable, List, Optional, Tuple
 from datetime import datetime, timedelta
-from collections import deque
+from collections import OrderedDict, deque
 from langchain_community.chat_models import ChatYandexGPT
 from app.core.config import settings
 from app.core.logging_config import llm_call_logger
@@ -21,6 +23,45 @@ from requests.exceptions import ConnectionError, Timeout, RequestException
 
 logger = logging.getLogger(__name__)
 
+# Analyses currently running in this process, keyed by their full input. Background
+# tasks each build their own LLMService, so the map is module-level: concurrent
+# requests for the same input await one shared LLM call instead of issuing their own.
+_INFLIGHT_ANALYSES: Dict[Hashable, "asyncio.Future[SkillScores]"] = {}
+
+# Completed free-text analyses by content hash -> (expires_at, scores), oldest first.
+_ANALYSIS_CACHE: "OrderedDict[str, Tuple[float, SkillScores]]" = OrderedDict()
+
+
+def _analysis_cache_key(text: str, context: Optional[str]) -> str:
+    # Case and whitespace do not change the prompt's meaning or the score calibration,
+    # so retries and re-sent answers that differ only in those hit the same entry.
+    normalized = " ".join(str(text or "").lower().split())
+    payload = f"{normalized}|{context or ''}".encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def _get_cached_analysis(key: str) -> Optional[SkillScores]:
+    entry = _ANALYSIS_CACHE.get(key)
+    if entry is None:
+        return None
+    expires_at, scores = entry
+    if expires_at <= time.monotonic():
+        del _ANALYSIS_CACHE[key]
+        return None
+    _ANALYSIS_CACHE.move_to_end(key)
+    return scores.model_copy()
+
+
+def _store_cached_analysis(key: str, scores: SkillScores) -> None:
+    ttl = int(settings.LLM_ANALYSIS_CACHE_TTL_SECONDS)
+    max_entries = int(settings.LLM_ANALYSIS_CACHE_MAX_ENTRIES)
+    if ttl <= 0 or max_entries <= 0:
+        return
+    _ANALYSIS_CACHE[key] = (time.monotonic() + ttl, scores.model_copy())
+    _ANALYSIS_CACHE.move_to_end(key)
+    while len(_ANALYSIS_CACHE) > max_entries:
+        _ANALYSIS_CACHE.popitem(last=False)
+
 
 class LLMServiceError(Exception):
     """Base exception for LLM service errors"""
@@ -62,9 +103,12 @@ class RateLimiter:
         self.time_window = timedelta(seconds=time_window_seconds)
         self.request_timestamps: deque = deque()
         
-    def check_rate_limit(self) -> bool:
+    def check_rate_limit(self, requests: int = 1) -> bool:
         """
-        Check if a new request would exceed the rate limit.
+        Check if new requests would exceed the rate limit.
+        
+        Args:
+            requests: Number of requests about to be made
         
         Returns:
             bool: True if request is allowed, False if rate limit exceeded
@@ -76,10 +120,10 @@ class RateLimiter:
             self.request_timestamps.popleft()
         
         # Check if we're at the limit
-        if len(self.request_timestamps) >= self.max_requests:
+        if len(self.request_timestamps) + requests > self.max_requests:
             logger.warning(
                 f"Rate limit exceeded: {len(self.request_timestamps)} requests "
-                f"in last {self.time_window.seconds} seconds"
+                f"in last {self.time_window.seconds} seconds, {requests} more requested"
             )
             return False
         
@@ -215,6 +259,8 @@ class LLMService:
     """Service for interacting with Yandex GPT for analysis and plan generation."""
     
     MAX_RETRIES = 2  # Maximum number of retry attempts for invalid responses
+    TEST_ANSWERS_CHUNK_SIZE = 10  # Questions per prompt when analyzing long tests
+    TEST_ANSWERS_CHUNK_CONCURRENCY = 2  # Chunk prompts of one test in flight at once
     
     def __init__(self, enable_rate_limiting: bool = True, max_requests_per_minute: int = 60):
         """
@@ -250,17 +296,20 @@ class LLMService:
             self.rate_limiter = None
             logger.info("Rate limiting disabled")
     
-    def _check_rate_limit(self) -> None:
+    def _check_rate_limit(self, requests: int = 1) -> None:
         """
         Check rate limit before making a request.
         
+        Args:
+            requests: Number of requests about to be made
+        
         Raises:
             LLMRateLimitError: If rate limit is exceeded
         """
         if not self.enable_rate_limiting or not self.rate_limiter:
             return
         
-        if not self.rate_limiter.check_rate_limit():
+        if not self.rate_limiter.check_rate_limit(requests):
             wait_time = self.rate_limiter.get_wait_time()
             raise LLMRateLimitError(
                 f"Превышен лимит запросов к сервису анализа. "
@@ -279,6 +328,37 @@ class LLMService:
             f"LLM backend is not configured for method '{method}'."
         )
     
+    async def _coalesce_analysis(
+        self,
+        key: Hashable,
+        run: Callable[[], Awaitable[SkillScores]],
+    ) -> SkillScores:
+        """
+        Share one in-flight LLM analysis between concurrent callers with the same input.
+        
+        Args:
+            key: Hashable description of the full analysis input
+            run: Starts the actual LLM analysis
+            
+        Returns:
+            SkillScores: Result of the shared analysis (errors are shared too)
+        """
+        pending = _INFLIGHT_ANALYSES.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(run())
+            _INFLIGHT_ANALYSES[key] = pending
+
+            def _forget(done: "asyncio.Future[SkillScores]") -> None:
+                _INFLIGHT_ANALYSES.pop(key, None)
+                if not done.cancelled():
+                    done.exception()  # mark as retrieved if every caller gave up
+
+            pending.add_done_callback(_forget)
+        else:
+            logger.info("Joining in-flight LLM analysis for identical input")
+        # shield: a caller timing out must not cancel the call other callers wait on
+        return await asyncio.shield(pending)
+    
     async def analyze_communication(
         self, 
         text: str, 
@@ -299,6 +379,24 @@ class LLMService:
             LLMRateLimitError: If rate limit is exceeded
             LLMInvalidResponseError: If response cannot be parsed after retries
         """
+        cache_key = _analysis_cache_key(text, context)
+        cached = _get_cached_analysis(cache_key)
+        if cached is not None:
+            logger.info("Reusing cached analysis for identical communication text")
+            return cached
+
+        skill_scores = await self._coalesce_analysis(
+            ("communication", cache_key),
+            lambda: self._analyze_communication(text, context),
+        )
+        _store_cached_analysis(cache_key, skill_scores)
+        return skill_scores.model_copy()
+
+    async def _analyze_communication(
+        self,
+        text: str,
+        context: Optional[str] = None
+    ) -> SkillScores:
         # Generate unique request ID for tracking
         request_id = str(uuid.uuid4())
         start_time = time.time()
@@ -324,7 +422,7 @@ class LLMService:
                 # Record request for rate limiting
                 self._record_request()
                 
-                response = self.llm.invoke(prompt)
+                response = await self.llm.ainvoke(prompt)
                 response_text = response.content
                 
                 # Calculate duration
@@ -369,7 +467,6 @@ class LLMService:
                         "Пожалуйста, попробуйте снова через несколько минут."
                     )
                 # Wait before retry (exponential backoff)
-                import asyncio
                 await asyncio.sleep(2 ** attempt)
                 
             except ValueError as e:
@@ -431,6 +528,81 @@ class LLMService:
             LLMRateLimitError: If rate limit is exceeded
             LLMInvalidResponseError: If response cannot be parsed after retries
         """
+        return await self._coalesce_analysis(
+            (
+                "test_answers",
+                test_type,
+                json.dumps([questions, answers], ensure_ascii=False, sort_keys=True, default=str),
+            ),
+            lambda: self._analyze_test_answers_in_chunks(test_type, questions, answers),
+        )
+
+    async def _analyze_test_answers_in_chunks(
+        self,
+        test_type: str,
+        questions: List[Dict[str, Any]],
+        answers: Dict[str, Any]
+    ) -> SkillScores:
+        # Long tests are split into shorter prompts, a few of them in flight at once; each
+        # chunk is calibrated on its own questions and the scores are merged by question count.
+        chunk_size = self.TEST_ANSWERS_CHUNK_SIZE
+        if len(questions) <= chunk_size:
+            return await self._analyze_test_answers(test_type, questions, answers)
+
+        chunks = [questions[i:i + chunk_size] for i in range(0, len(questions), chunk_size)]
+        # Finished chunks are cached, so a retry after a partial failure only re-sends
+        # the chunks that failed.
+        cache_keys = [
+            _analysis_cache_key(
+                json.dumps([chunk, answers], ensure_ascii=False, sort_keys=True, default=str),
+                f"test_answers|{test_type}",
+            )
+            for chunk in chunks
+        ]
+        results: List[Any] = [_get_cached_analysis(key) for key in cache_keys]
+        pending = [index for index, result in enumerate(results) if result is None]
+
+        # Check there is rate-limit room for every chunk before sending any, instead of
+        # failing part-way; each chunk still records its own request once it is sent.
+        self._check_rate_limit(len(pending))
+
+        semaphore = asyncio.Semaphore(self.TEST_ANSWERS_CHUNK_CONCURRENCY)
+
+        async def _analyze_chunk(index: int) -> SkillScores:
+            async with semaphore:
+                scores = await self._analyze_test_answers(test_type, chunks[index], answers)
+            _store_cached_analysis(cache_keys[index], scores)
+            return scores
+
+        outcomes = await asyncio.gather(
+            *(_analyze_chunk(index) for index in pending),
+            return_exceptions=True,
+        )
+        for index, outcome in zip(pending, outcomes):
+            if isinstance(outcome, BaseException):
+                raise outcome
+            results[index] = outcome
+
+        total = len(questions)
+        merged = {
+            key: sum(getattr(scores, key) * len(chunk) for scores, chunk in zip(results, chunks)) / total
+            for key in (
+                "communication",
+                "emotional_intelligence",
+                "critical_thinking",
+                "time_management",
+                "leadership",
+            )
+        }
+        feedback = "\n".join(f"- {scores.feedback}" for scores in results if scores.feedback)
+        return SkillScores(**merged, feedback=feedback or None)
+
+    async def _analyze_test_answers(
+        self,
+        test_type: str,
+        questions: List[Dict[str, Any]],
+        answers: Dict[str, Any]
+    ) -> SkillScores:
         # Generate unique request ID for tracking
         request_id = str(uuid.uuid4())
         start_time = time.time()
@@ -460,7 +632,7 @@ class LLMService:
                 # Record request for rate limiting
                 self._record_request()
                 
-                response = self.llm.invoke(prompt)
+                response = await self.llm.ainvoke(prompt)
                 response_text = response.content
                 
                 # Calculate duration
@@ -505,7 +677,6 @@ class LLMService:
                         "Пожалуйста, попробуйте снова через несколько минут."
                     )
                 # Wait before retry (exponential backoff)
-                import asyncio
                 await asyncio.sleep(2 ** attempt)
                 
             except ValueError as e:
@@ -596,7 +767,7 @@ class LLMService:
                 # Record request for rate limiting
                 self._record_request()
                 
-                response = self.llm.invoke(prompt)
+                response = await self.llm.ainvoke(prompt)
                 response_text = response.content
                 
                 # Calculate duration
@@ -652,7 +823,6 @@ class LLMService:
                         "Пожалуйста, попробуйте снова через несколько минут."
                     )
                 # Wait before retry (exponential backoff)
-                import asyncio
                 await asyncio.sleep(2 ** attempt)
                 
             except ValueError as e:
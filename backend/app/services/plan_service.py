@@ -3,30 +3,372 @@ Development Plan Service for managing user development plans.
 Handles plan generation, task completion tracking, and plan regeneration logic.
 """
 
+import asyncio
+import itertools
 import logging
-from typing import Optional, List, Dict, Any
+import re
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Optional, List, Dict, Any, Iterable, Mapping, Tuple
 from datetime import datetime, timedelta, timezone
 from urllib.parse import urlparse
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, desc, func
+from sqlalchemy import select, update, and_, or_, bindparam, case, desc, func
 from sqlalchemy.orm.attributes import flag_modified
 
 from app.models.profile import DevelopmentPlan, SoftSkillsProfile, ProfileHistory
 from app.models.analysis import AnalysisResult
 from app.models.content import Test, Question, UserTestResult, CaseSolution
 from app.schemas.plan import DevelopmentPlanContent, MaterialItem, TaskItem, TestRecommendation
-from app.services.llm_service import LLMService
+from app.services.llm_service import llm_service
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Static keyword table, frozen so the shared map can be handed out without copies.
+_SKILL_KEYWORDS: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    "communication": (
+        "коммуник",
+        "общение",
+        "переговор",
+        "диалог",
+        "communication",
+        "conversation",
+    ),
+    "emotional_intelligence": (
+        "эмоци",
+        "эмпат",
+        "emotional",
+        "intelligence",
+        "ei",
+    ),
+    "critical_thinking": (
+        "крит",
+        "мышлен",
+        "логик",
+        "аргумент",
+        "critical",
+        "thinking",
+    ),
+    "time_management": (
+        "тайм",
+        "времен",
+        "дедлайн",
+        "приоритет",
+        "time",
+        "management",
+    ),
+    "leadership": (
+        "лидер",
+        "команд",
+        "влияни",
+        "leadership",
+        "lead",
+    ),
+})
+
+_PROFILE_SCORE_FIELDS = (
+    "communication_score",
+    "emotional_intelligence_score",
+    "critical_thinking_score",
+    "time_management_score",
+    "leadership_score",
+)
+
+_SKILL_ORDER: Tuple[str, ...] = tuple(_SKILL_KEYWORDS)
+
+# All skill keywords in one multi-pattern matcher: a named group per skill inside a
+# lookahead, so a single finditer pass reports every keyword start position. Groups
+# follow _SKILL_ORDER, which keeps the "earlier skill wins" precedence of the old
+# per-skill scans even when keywords of different skills overlap.
+_SKILL_MATCHER: re.Pattern = re.compile(
+    "(?="
+    + "|".join(
+        f"(?P<{skill}>{'|'.join(map(re.escape, keywords))})"
+        for skill, keywords in _SKILL_KEYWORDS.items()
+    )
+    + ")"
+)
+
+
+# Keywords are word stems ("коммуник", "эмоци"), so matching has to stay substring
+# based; instead the few distinct inputs (weakness labels, test-catalog haystacks)
+# are memoized so repeated lookups are a single hashed cache hit.
+@lru_cache(maxsize=1024)
+def _matched_skill(text: str) -> Optional[str]:
+    best_rank: Optional[int] = None
+    for match in _SKILL_MATCHER.finditer(text):
+        rank = match.lastindex - 1
+        if best_rank is None or rank < best_rank:
+            best_rank = rank
+            if best_rank == 0:
+                break
+    return _SKILL_ORDER[best_rank] if best_rank is not None else None
+
+
+# Weakness labels in the order _identify_weaknesses ranks tied scores.
+_WEAKNESS_LABELS: Tuple[str, ...] = (
+    "Тайм-менеджмент",
+    "Критическое мышление",
+    "Коммуникация",
+    "Эмоциональный интеллект",
+    "Лидерство",
+)
+
+
+@lru_cache(maxsize=1024)
+def _weakest_labels(scores: Tuple[float, ...]) -> Tuple[str, ...]:
+    # Profiles move in small weighted steps and many users share score combinations,
+    # so the ranking is cached per exact score tuple. sorted() is stable: ties keep
+    # label order.
+    order = sorted(range(len(scores)), key=scores.__getitem__)
+    return tuple(_WEAKNESS_LABELS[index] for index in order[:3])
+
+
+@lru_cache(maxsize=512)
+def _url_domain(url: str) -> str:
+    # Material URLs come from a small fixed set, so repeated urlparse calls are cached.
+    parsed = urlparse(url.strip().lower())
+    return (parsed.netloc or "").removeprefix("www.")
+
+
+# Curated materials are static, so the library is built once per process and frozen
+# to keep request code from mutating shared entries. Each entry also carries its
+# precomputed "_domain" for the per-domain limits in _select_curated_materials.
+_CURATED_MATERIAL_LIBRARY: Tuple[Mapping[str, str], ...] = tuple(
+    MappingProxyType({**entry, "_domain": _url_domain(entry["url"])})
+    for entry in (
+        {
+            "id": "ru_4brain_comm_communication",
+            "title": "Эффективное общение: вербальная и невербальная коммуникация",
+            "url": "https://4brain.ru/management/communication.php",
+            "type": "article",
+            "skill": "communication",
+        },
+        {
+            "id": "ru_4brain_comm_nonverbal",
+            "title": "Невербальная коммуникация",
+            "url": "https://4brain.ru/nonverbal/",
+            "type": "article",
+            "skill": "communication",
+        },
+        {
+            "id": "ru_4brain_comm_listening",
+            "title": "Техники активного (глубокого) слушания",
+            "url": "https://4brain.ru/blog/glubokoe-slushanie/",
+            "type": "article",
+            "skill": "communication",
+        },
+        {
+            "id": "ru_4brain_comm_negotiation",
+            "title": "Ведение переговоров: основы и структура",
+            "url": "https://4brain.ru/peregovory/",
+            "type": "article",
+            "skill": "communication",
+        },
+        {
+            "id": "ru_4brain_comm_rhetoric",
+            "title": "Ораторское искусство: уроки риторики",
+            "url": "https://4brain.ru/oratorskoe-iskusstvo/",
+            "type": "article",
+            "skill": "communication",
+        },
+        {
+            "id": "ru_stepik_comm_effective",
+            "title": "Навыки эффективной коммуникации",
+            "url": "https://stepik.org/course/205042/promo",
+            "type": "course",
+            "skill": "communication",
+        },
+        {
+            "id": "ru_stepik_comm_business",
+            "title": "Деловые коммуникации",
+            "url": "https://stepik.org/course/87737/promo",
+            "type": "course",
+            "skill": "communication",
+        },
+        {
+            "id": "ru_openedu_teamwork",
+            "title": "Командная работа",
+            "url": "https://openedu.ru/course/ITMOUniversity/TEAMWORK/",
+            "type": "course",
+            "skill": "communication",
+        },
+        {
+            "id": "ru_4brain_ei_base",
+            "title": "Эмоциональный интеллект: основы и упражнения",
+            "url": "https://4brain.ru/emotion/",
+            "type": "article",
+            "skill": "emotional_intelligence",
+        },
+        {
+            "id": "ru_4brain_ei_article",
+            "title": "Как развить эмоциональный интеллект",
+            "url": "https://4brain.ru/blog/emotional-intellect/",
+            "type": "article",
+            "skill": "emotional_intelligence",
+        },
+        {
+            "id": "ru_stepik_ei",
+            "title": "Эмоциональный интеллект: ключ к успеху",
+            "url": "https://stepik.org/course/133690/promo",
+            "type": "course",
+            "skill": "emotional_intelligence",
+        },
+        {
+            "id": "ru_4brain_ct_base",
+            "title": "Критическое мышление: что это и как развивать",
+            "url": "https://4brain.ru/critical/",
+            "type": "article",
+            "skill": "critical_thinking",
+        },
+        {
+            "id": "ru_4brain_ct_skills",
+            "title": "Критическое мышление: навыки и свойства",
+            "url": "https://4brain.ru/critical/navyk.php",
+            "type": "article",
+            "skill": "critical_thinking",
+        },
+        {
+            "id": "ru_stepik_ct",
+            "title": "Критическое мышление",
+            "url": "https://stepik.org/course/63700/promo",
+            "type": "course",
+            "skill": "critical_thinking",
+        },
+        {
+            "id": "ru_postnauka_ct_video",
+            "title": "Критическое мышление",
+            "url": "https://postnauka.ru/tv/155334",
+            "type": "video",
+            "skill": "critical_thinking",
+        },
+        {
+            "id": "ru_4brain_tm_base",
+            "title": "Тайм-менеджмент: управление временем",
+            "url": "https://4brain.ru/time/",
+            "type": "article",
+            "skill": "time_management",
+        },
+        {
+            "id": "ru_4brain_tm_basics",
+            "title": "Тайм-менеджмент: основы",
+            "url": "https://4brain.ru/time/osnovy.php",
+            "type": "article",
+            "skill": "time_management",
+        },
+        {
+            "id": "ru_4brain_tm_psy",
+            "title": "Психологические аспекты тайм-менеджмента",
+            "url": "https://4brain.ru/blog/psihologiya-taym-menedzhmenta/",
+            "type": "article",
+            "skill": "time_management",
+        },
+        {
+            "id": "ru_openedu_tm_course",
+            "title": "Онлайн-курс: Тайм-менеджмент",
+            "url": "https://openedu.ru/course/misis/TMNG/",
+            "type": "course",
+            "skill": "time_management",
+        },
+        {
+            "id": "ru_stepik_tm",
+            "title": "Тайм-менеджмент",
+            "url": "https://stepik.org/course/102186/promo",
+            "type": "course",
+            "skill": "time_management",
+        },
+        {
+            "id": "ru_4brain_lead_base",
+            "title": "Лидерство: базовые принципы и подходы",
+            "url": "https://4brain.ru/liderstvo/",
+            "type": "article",
+            "skill": "leadership",
+        },
+        {
+            "id": "ru_4brain_lead_course",
+            "title": "Лидерство и мотивация: основы",
+            "url": "https://4brain.ru/management/leadership.php",
+            "type": "article",
+            "skill": "leadership",
+        },
+        {
+            "id": "ru_4brain_lead_practice",
+            "title": "Как быть лидером: практические советы",
+            "url": "https://4brain.ru/blog/kak-byt-liderom/",
+            "type": "article",
+            "skill": "leadership",
+        },
+        {
+            "id": "ru_openedu_lead_course",
+            "title": "Лидерство и командообразование",
+            "url": "https://openedu.ru/course/mephi/mephi_lfkpt/",
+            "type": "course",
+            "skill": "leadership",
+        },
+        {
+            "id": "ru_stepik_lead_team",
+            "title": "Лидерство и командообразование",
+            "url": "https://stepik.org/course/83003/promo",
+            "type": "course",
+            "skill": "leadership",
+        },
+    )
+)
+
+_CURATED_LIBRARY_BY_SKILL: Dict[str, Tuple[Mapping[str, str], ...]] = {
+    skill: tuple(entry for entry in _CURATED_MATERIAL_LIBRARY if entry["skill"] == skill)
+    for skill in {entry["skill"] for entry in _CURATED_MATERIAL_LIBRARY}
+}
+_CURATED_LIBRARY_BY_TYPE: Dict[str, Tuple[Mapping[str, str], ...]] = {
+    material_type: tuple(entry for entry in _CURATED_MATERIAL_LIBRARY if entry["type"] == material_type)
+    for material_type in {entry["type"] for entry in _CURATED_MATERIAL_LIBRARY}
+}
+
+# (article_opened, test_completed) -> material progress; each half is worth 50%.
+_MATERIAL_PROGRESS_PERCENTAGE: Dict[Tuple[bool, bool], float] = {
+    (False, False): 0.0,
+    (True, False): 50.0,
+    (False, True): 50.0,
+    (True, True): 100.0,
+}
+
+# Checked in order, so a weakness mentioning several skills keeps the earlier mapping.
+_WEAKNESS_SKILL_TOKENS: Tuple[Tuple[Tuple[str, ...], str], ...] = (
+    (("тайм", "времен"), "time_management"),
+    (("крит",), "critical_thinking"),
+    (("коммуник", "общен"), "communication"),
+    (("эмоцион",), "emotional_intelligence"),
+    (("лидер",), "leadership"),
+)
+
+# Substring matches: these also catch subdomains and mirrors of the blocked hosts.
+_BAD_MATERIAL_URL_TOKENS = ("example.com", "en.wikipedia.org", "ted.com", "skillbox.ru")
+
+# Hot per-request selects are built once with bound parameters instead of being
+# reconstructed on every call; values are passed at execute time.
+_ACTIVE_PLAN_BY_USER = (
+    select(DevelopmentPlan)
+    .where(
+        and_(
+            DevelopmentPlan.user_id == bindparam("user_id"),
+            DevelopmentPlan.is_archived == False
+        )
+    )
+    .order_by(desc(DevelopmentPlan.generated_at))
+)
+_PROFILE_BY_USER = select(SoftSkillsProfile).where(SoftSkillsProfile.user_id == bindparam("user_id"))
+_NON_SIMULATION_TESTS = select(Test).where(Test.type != "simulation").order_by(Test.id.asc())
+
 
 class PlanService:
     """Service for managing development plans and their lifecycle."""
     
     def __init__(self):
-        self.llm_service = LLMService()
+        # The process-wide LLM client: building one per service costs a client setup
+        # and would give each instance its own rate limiter.
+        self.llm_service = llm_service
 
     def _text_quality_score(self, value: str) -> int:
         letters = sum(1 for ch in value if ch.isalpha())
@@ -66,47 +408,11 @@ class PlanService:
             return {key: self._repair_payload_encoding(item) for key, item in value.items()}
         return value
 
-    def _skill_keywords(self) -> Dict[str, List[str]]:
-        return {
-            "communication": [
-                "коммуник",
-                "общение",
-                "переговор",
-                "диалог",
-                "communication",
-                "conversation",
-            ],
-            "emotional_intelligence": [
-                "эмоци",
-                "эмпат",
-                "emotional",
-                "intelligence",
-                "ei",
-            ],
-            "critical_thinking": [
-                "крит",
-                "мышлен",
-                "логик",
-                "аргумент",
-                "critical",
-                "thinking",
-            ],
-            "time_management": [
-                "тайм",
-                "времен",
-                "дедлайн",
-                "приоритет",
-                "time",
-                "management",
-            ],
-            "leadership": [
-                "лидер",
-                "команд",
-                "влияни",
-                "leadership",
-                "lead",
-            ],
-        }
+    def _skill_keywords(self) -> Mapping[str, Tuple[str, ...]]:
+        return _SKILL_KEYWORDS
+
+    def _match_skill(self, text: str) -> Optional[str]:
+        return _matched_skill(text)
 
     def _normalize_text(self, value: Any) -> str:
         return self._repair_text_encoding(value).strip().lower()
@@ -369,8 +675,8 @@ class PlanService:
             await db.delete(question)
         await db.flush()
 
-        for question in normalized_expected:
-            db.add(
+        db.add_all(
+            [
                 Question(
                     test_id=int(test_id),
                     text=question["text"],
@@ -378,11 +684,15 @@ class PlanService:
                     options=question["options"],
                     correct_answer=None,
                 )
-            )
+                for question in normalized_expected
+            ]
+        )
         await db.flush()
 
     def _is_final_title(self, value: str) -> bool:
-        normalized = self._normalize_text(value)
+        return self._is_final_normalized_title(self._normalize_text(value))
+
+    def _is_final_normalized_title(self, normalized: str) -> bool:
         if not normalized:
             return False
         return (
@@ -400,6 +710,17 @@ class PlanService:
         description = str(getattr(test, "description", "") or "")
         return self._is_final_title(title) or self._is_final_title(description)
 
+    def _safe_int(self, value: Any) -> Optional[int]:
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, int):
+            return value
+        if isinstance(value, str):
+            text = value.strip()
+            if text.lstrip("-").isdecimal():
+                return int(text)
+        return None
+
     def _parse_iso_datetime(self, value: Any) -> Optional[datetime]:
         if not value:
             return None
@@ -414,12 +735,7 @@ class PlanService:
             return None
 
     def _material_progress_percentage(self, article_opened: bool, test_completed: bool) -> float:
-        score = 0
-        if article_opened:
-            score += 50
-        if test_completed:
-            score += 50
-        return float(score)
+        return _MATERIAL_PROGRESS_PERCENTAGE[(bool(article_opened), bool(test_completed))]
 
     def _compute_components_progress(
         self,
@@ -536,22 +852,16 @@ class PlanService:
         }
         filtered_tests = [t for t in tests if str(t.type).lower() != "simulation" and not self._is_final_test(t)]
         tests_by_id = {int(t.id): t for t in filtered_tests}
-        skill_keywords = self._skill_keywords()
-
-        tests_by_skill: Dict[str, List[int]] = {skill: [] for skill in skill_keywords.keys()}
+        tests_by_skill: Dict[str, List[int]] = {skill: [] for skill in _SKILL_KEYWORDS}
         fallback_ids: List[int] = []
         for test in filtered_tests:
             text = f"{test.title} {test.description}".lower()
             fallback_ids.append(int(test.id))
-            matched_skill: Optional[str] = None
-            for skill, keywords in skill_keywords.items():
-                if any(keyword in text for keyword in keywords):
-                    matched_skill = skill
-                    break
+            matched_skill = self._match_skill(text)
             if matched_skill:
                 tests_by_skill[matched_skill].append(int(test.id))
 
-        usage_cursor: Dict[str, int] = {skill: 0 for skill in skill_keywords.keys()}
+        usage_cursor: Dict[str, int] = {skill: 0 for skill in _SKILL_KEYWORDS}
         fallback_cursor = 0
         mapping: Dict[str, int] = {}
         used_ids: set[int] = set()
@@ -573,34 +883,35 @@ class PlanService:
             return not has_new_alternative
 
         def _pick_candidate(candidate_ids: List[int], start_idx: int) -> tuple[Optional[int], int]:
-            if not candidate_ids:
+            candidate_count = len(candidate_ids)
+            if not candidate_count:
                 return None, start_idx
 
             # Prefer tests that user has not completed in previous plan blocks.
-            for offset in range(len(candidate_ids)):
-                idx = (start_idx + offset) % len(candidate_ids)
+            for offset in range(candidate_count):
+                idx = (start_idx + offset) % candidate_count
                 candidate_id = candidate_ids[idx]
                 if candidate_id in used_ids or candidate_id in completed_ids:
                     continue
                 return candidate_id, idx + 1
 
             # Then allow any non-used test.
-            for offset in range(len(candidate_ids)):
-                idx = (start_idx + offset) % len(candidate_ids)
+            for offset in range(candidate_count):
+                idx = (start_idx + offset) % candidate_count
                 candidate_id = candidate_ids[idx]
                 if candidate_id in used_ids:
                     continue
                 return candidate_id, idx + 1
 
             # If all are used, still prefer not-completed to reduce repetition.
-            for offset in range(len(candidate_ids)):
-                idx = (start_idx + offset) % len(candidate_ids)
+            for offset in range(candidate_count):
+                idx = (start_idx + offset) % candidate_count
                 candidate_id = candidate_ids[idx]
                 if candidate_id in completed_ids:
                     continue
                 return candidate_id, idx + 1
 
-            idx = start_idx % len(candidate_ids)
+            idx = start_idx % candidate_count
             return candidate_ids[idx], start_idx + 1
 
         for material in materials:
@@ -608,11 +919,7 @@ class PlanService:
             if not material_id:
                 continue
 
-            current_value = existing_map.get(material_id)
-            try:
-                current_id = int(current_value) if current_value is not None else None
-            except Exception:
-                current_id = None
+            current_id = self._safe_int(existing_map.get(material_id))
 
             skill = str(material.get("skill", "")).strip().lower()
             candidate_ids = tests_by_skill.get(skill) or []
@@ -624,8 +931,8 @@ class PlanService:
 
             selected_id: Optional[int] = None
             if candidate_ids:
-                selected_id, next_cursor = _pick_candidate(candidate_ids, usage_cursor.get(skill, 0))
-                usage_cursor[skill] = next_cursor
+                # candidate_ids is non-empty only for known skills, so the cursor always exists.
+                selected_id, usage_cursor[skill] = _pick_candidate(candidate_ids, usage_cursor[skill])
 
             if selected_id is None and fallback_ids:
                 selected_id, fallback_cursor = _pick_candidate(fallback_ids, fallback_cursor)
@@ -661,11 +968,7 @@ class PlanService:
         legacy_final_simulation_title = self._legacy_final_simulation_title(target_difficulty)
 
         final_test = None
-        final_test_id_raw = final_stage.get("final_test_id")
-        try:
-            final_test_id = int(final_test_id_raw) if final_test_id_raw is not None else None
-        except Exception:
-            final_test_id = None
+        final_test_id = self._safe_int(final_stage.get("final_test_id"))
         if final_test_id is not None:
             test_res = await db.execute(select(Test).where(Test.id == final_test_id))
             candidate = test_res.scalars().first()
@@ -699,11 +1002,7 @@ class PlanService:
         )
 
         final_simulation = None
-        final_simulation_id_raw = final_stage.get("final_simulation_id")
-        try:
-            final_simulation_id = int(final_simulation_id_raw) if final_simulation_id_raw is not None else None
-        except Exception:
-            final_simulation_id = None
+        final_simulation_id = self._safe_int(final_stage.get("final_simulation_id"))
         if final_simulation_id is not None:
             simulation_res = await db.execute(select(Test).where(Test.id == final_simulation_id))
             candidate = simulation_res.scalars().first()
@@ -751,12 +1050,12 @@ class PlanService:
     async def _get_completion_test_ids(
         self,
         user_id: int,
-        test_ids: List[int],
+        test_ids: Iterable[int],
         db: AsyncSession,
         completed_after: Optional[datetime] = None,
         completed_before: Optional[datetime] = None,
     ) -> set[int]:
-        unique_ids = sorted({int(test_id) for test_id in test_ids if int(test_id) > 0})
+        unique_ids = {test_id for test_id in map(int, test_ids) if test_id > 0}
         if not unique_ids:
             return set()
 
@@ -774,7 +1073,6 @@ class PlanService:
             else:
                 completed_before_utc = completed_before
 
-        completed_ids: set[int] = set()
         results_query = select(UserTestResult.test_id).where(
             UserTestResult.user_id == user_id,
             UserTestResult.test_id.in_(unique_ids),
@@ -784,8 +1082,7 @@ class PlanService:
         if completed_before_utc is not None:
             results_query = results_query.where(UserTestResult.completed_at < completed_before_utc)
         results_res = await db.execute(results_query)
-        for value in list(results_res.scalars().all()):
-            completed_ids.add(int(value))
+        completed_ids: set[int] = {int(value) for value in results_res.scalars()}
 
         cases_query = select(CaseSolution.test_id).where(
             CaseSolution.user_id == user_id,
@@ -796,8 +1093,7 @@ class PlanService:
         if completed_before_utc is not None:
             cases_query = cases_query.where(CaseSolution.created_at < completed_before_utc)
         cases_res = await db.execute(cases_query)
-        for value in list(cases_res.scalars().all()):
-            completed_ids.add(int(value))
+        completed_ids.update(int(value) for value in cases_res.scalars())
 
         return completed_ids
 
@@ -808,11 +1104,77 @@ class PlanService:
     ) -> None:
         floor = self._next_level_floor_for_difficulty(target_difficulty)
         step = 8
-        profile.communication_score = min(100.0, max(float(profile.communication_score or 0.0) + step, float(floor)))
-        profile.emotional_intelligence_score = min(100.0, max(float(profile.emotional_intelligence_score or 0.0) + step, float(floor)))
-        profile.critical_thinking_score = min(100.0, max(float(profile.critical_thinking_score or 0.0) + step, float(floor)))
-        profile.time_management_score = min(100.0, max(float(profile.time_management_score or 0.0) + step, float(floor)))
-        profile.leadership_score = min(100.0, max(float(profile.leadership_score or 0.0) + step, float(floor)))
+        for attr in _PROFILE_SCORE_FIELDS:
+            setattr(profile, attr, min(100.0, max(float(getattr(profile, attr) or 0.0) + step, float(floor))))
+
+    async def _tracking_sync_marker(self, user_id: int, db: AsyncSession) -> List[str]:
+        # Everything sync_plan_tracking reads from the database changes only when the user
+        # completes a test/case or the test catalog changes, so a cheap aggregate row is
+        # enough to tell whether a previous sync is still up to date. Tests bump
+        # updated_at on every edit and the count covers deletions, so admin changes to
+        # the catalog invalidate the marker as well.
+        marker_res = await db.execute(
+            select(
+                select(func.max(UserTestResult.completed_at))
+                .where(UserTestResult.user_id == user_id)
+                .scalar_subquery(),
+                select(func.max(CaseSolution.created_at))
+                .where(CaseSolution.user_id == user_id)
+                .scalar_subquery(),
+                select(func.count(Test.id)).scalar_subquery(),
+                select(func.max(Test.updated_at)).scalar_subquery(),
+            )
+        )
+        return [str(value) for value in marker_res.one()]
+
+    def reset_tracking_cache(self, content: Dict[str, Any]) -> None:
+        """Force the next sync_plan_tracking call on this plan content to run in full."""
+        content.pop("tracking_sync_marker", None)
+
+    def _cached_plan_tracking(
+        self,
+        content: Dict[str, Any],
+        tasks: List[Dict[str, Any]],
+        materials: List[Dict[str, Any]],
+        sync_marker: List[str],
+    ) -> Optional[Dict[str, Any]]:
+        if content.get("tracking_sync_marker") != sync_marker:
+            return None
+
+        material_progress = content.get("material_progress")
+        final_stage = content.get("final_stage")
+        achievements = content.get("block_achievements")
+        if (
+            not isinstance(material_progress, dict)
+            or not isinstance(final_stage, dict)
+            or not isinstance(achievements, list)
+            or not isinstance(content.get("material_test_map"), dict)
+        ):
+            return None
+        if final_stage.get("final_test_id") is None or final_stage.get("final_simulation_id") is None:
+            return None
+
+        for material in materials:
+            material_id = str(material.get("id", "")).strip()
+            if not material_id:
+                continue
+            entry = material_progress.get(material_id)
+            # Entries created outside of a full sync (e.g. by opening an article) lack the link.
+            if not isinstance(entry, dict) or "linked_test_id" not in entry:
+                return None
+
+        progress = self._compute_components_progress(tasks, materials, material_progress)
+        if bool(final_stage.get("unlocked")) != bool(progress.get("percentage", 0) >= 100):
+            return None
+        if final_stage.get("achievement_title") != self._build_block_achievement_title(content):
+            return None
+
+        return {
+            "material_progress": material_progress,
+            "progress": progress,
+            "final_stage": final_stage,
+            "block_achievements": achievements,
+        }
 
     async def sync_plan_tracking(
         self,
@@ -832,17 +1194,19 @@ class PlanService:
         if not isinstance(tasks, list):
             tasks = []
 
+        sync_marker = await self._tracking_sync_marker(user_id, db)
+        cached = self._cached_plan_tracking(content, tasks, materials, sync_marker)
+        if cached is not None:
+            return cached
+
         changed = False
 
-        tests_res = await db.execute(select(Test).where(Test.type != "simulation").order_by(Test.id.asc()))
-        regular_tests = [t for t in list(tests_res.scalars().all()) if not self._is_final_test(t)]
+        tests_res = await db.execute(_NON_SIMULATION_TESTS)
+        regular_tests = [t for t in tests_res.scalars() if not self._is_final_test(t)]
         regular_test_ids: List[int] = []
         for t in regular_tests:
-            try:
-                test_id = int(t.id)
-            except Exception:
-                continue
-            if test_id > 0:
+            test_id = self._safe_int(t.id)
+            if test_id is not None and test_id > 0:
                 regular_test_ids.append(test_id)
         completed_before_plan = await self._get_completion_test_ids(
             user_id,
@@ -863,17 +1227,19 @@ class PlanService:
             content["material_test_map"] = material_test_map
             changed = True
 
-        material_ids = [str(m.get("id", "")).strip() for m in materials if str(m.get("id", "")).strip()]
+        material_ids = [material_id for m in materials if (material_id := str(m.get("id", "")).strip())]
         raw_material_progress = content.get("material_progress")
         material_progress = raw_material_progress if isinstance(raw_material_progress, dict) else {}
 
+        linked_test_ids: Dict[str, int] = {}
+        for key, value in material_test_map.items():
+            linked_test_id = self._safe_int(value)
+            if linked_test_id is not None:
+                linked_test_ids[str(key)] = linked_test_id
+
         mapped_test_ids: List[int] = []
         for material_id in material_ids:
-            value = material_test_map.get(material_id)
-            try:
-                test_id = int(value) if value is not None else None
-            except Exception:
-                test_id = None
+            test_id = linked_test_ids.get(material_id)
             if test_id is not None and test_id > 0:
                 mapped_test_ids.append(test_id)
 
@@ -890,13 +1256,8 @@ class PlanService:
             entry = material_progress.get(material_id) if isinstance(material_progress.get(material_id), dict) else {}
             article_opened = bool(entry.get("article_opened"))
             article_opened_at = entry.get("article_opened_at")
-            linked_test_id_raw = material_test_map.get(material_id)
-            try:
-                linked_test_id = int(linked_test_id_raw) if linked_test_id_raw is not None else None
-            except Exception:
-                linked_test_id = None
-
-            test_completed = linked_test_id in completed_test_ids if linked_test_id is not None else False
+            linked_test_id = linked_test_ids.get(material_id)
+            test_completed = linked_test_id is not None and linked_test_id in completed_test_ids
             test_completed_at = entry.get("test_completed_at")
             if test_completed and not test_completed_at:
                 test_completed_at = now_iso
@@ -922,22 +1283,14 @@ class PlanService:
         previous_final_stage = content.get("final_stage")
         if not isinstance(previous_final_stage, dict):
             previous_final_stage = {}
-        previous_final_stage_snapshot = jsonable_encoder(previous_final_stage)
+        # _ensure_final_stage_tests mutates the stored dict in place; a shallow copy is
+        # enough to detect changes because final_stage only holds scalar values.
+        previous_final_stage_snapshot = dict(previous_final_stage)
 
         final_stage = await self._ensure_final_stage_tests(content, db)
-        final_test_id = final_stage.get("final_test_id")
-        final_simulation_id = final_stage.get("final_simulation_id")
-        completion_ids: List[int] = []
-        try:
-            if final_test_id is not None:
-                completion_ids.append(int(final_test_id))
-        except Exception:
-            pass
-        try:
-            if final_simulation_id is not None:
-                completion_ids.append(int(final_simulation_id))
-        except Exception:
-            pass
+        final_test_id = self._safe_int(final_stage.get("final_test_id"))
+        final_simulation_id = self._safe_int(final_stage.get("final_simulation_id"))
+        completion_ids = {value for value in (final_test_id, final_simulation_id) if value is not None}
         completion_set = await self._get_completion_test_ids(
             user_id,
             completion_ids,
@@ -945,8 +1298,8 @@ class PlanService:
             completed_after=plan.generated_at,
         )
 
-        final_test_completed = int(final_test_id) in completion_set if final_test_id is not None else False
-        final_simulation_completed = int(final_simulation_id) in completion_set if final_simulation_id is not None else False
+        final_test_completed = final_test_id is not None and final_test_id in completion_set
+        final_simulation_completed = final_simulation_id is not None and final_simulation_id in completion_set
 
         final_stage["unlocked"] = bool(progress.get("percentage", 0) >= 100)
         final_stage["final_test_completed"] = final_test_completed
@@ -971,11 +1324,19 @@ class PlanService:
         content["final_stage"] = final_stage
         content["block_achievements"] = achievements
 
+        # The marker read before syncing is stored as-is: if completions arrived or
+        # final-stage tests were created meanwhile, it is already stale and the next call
+        # simply syncs once more.
+        if content.get("tracking_sync_marker") != sync_marker:
+            content["tracking_sync_marker"] = sync_marker
+            changed = True
+
         if changed:
-            plan.content = jsonable_encoder(content)
+            # Content is loaded from the JSON column and only holds JSON-safe values,
+            # so it can be stored as-is without another jsonable_encoder pass.
+            plan.content = content
             flag_modified(plan, "content")
             await db.commit()
-            await db.refresh(plan)
 
         return {
             "material_progress": material_progress,
@@ -993,7 +1354,7 @@ class PlanService:
         if plan is None:
             raise ValueError("У вас нет активного плана развития")
 
-        profile_res = await db.execute(select(SoftSkillsProfile).where(SoftSkillsProfile.user_id == user_id))
+        profile_res = await db.execute(_PROFILE_BY_USER, {"user_id": user_id})
         profile = profile_res.scalar_one_or_none()
         if profile is None:
             raise ValueError("Профиль не найден. Сначала пройдите тест или отправьте сообщение в чат.")
@@ -1076,226 +1437,41 @@ class PlanService:
             "achievement_title": achievement_title,
         }
 
-    def _curated_material_library(self) -> List[Dict[str, str]]:
-        return [
-            {
-                "id": "ru_4brain_comm_communication",
-                "title": "Эффективное общение: вербальная и невербальная коммуникация",
-                "url": "https://4brain.ru/management/communication.php",
-                "type": "article",
-                "skill": "communication",
-            },
-            {
-                "id": "ru_4brain_comm_nonverbal",
-                "title": "Невербальная коммуникация",
-                "url": "https://4brain.ru/nonverbal/",
-                "type": "article",
-                "skill": "communication",
-            },
-            {
-                "id": "ru_4brain_comm_listening",
-                "title": "Техники активного (глубокого) слушания",
-                "url": "https://4brain.ru/blog/glubokoe-slushanie/",
-                "type": "article",
-                "skill": "communication",
-            },
-            {
-                "id": "ru_4brain_comm_negotiation",
-                "title": "Ведение переговоров: основы и структура",
-                "url": "https://4brain.ru/peregovory/",
-                "type": "article",
-                "skill": "communication",
-            },
-            {
-                "id": "ru_4brain_comm_rhetoric",
-                "title": "Ораторское искусство: уроки риторики",
-                "url": "https://4brain.ru/oratorskoe-iskusstvo/",
-                "type": "article",
-                "skill": "communication",
-            },
-            {
-                "id": "ru_stepik_comm_effective",
-                "title": "Навыки эффективной коммуникации",
-                "url": "https://stepik.org/course/205042/promo",
-                "type": "course",
-                "skill": "communication",
-            },
-            {
-                "id": "ru_stepik_comm_business",
-                "title": "Деловые коммуникации",
-                "url": "https://stepik.org/course/87737/promo",
-                "type": "course",
-                "skill": "communication",
-            },
-            {
-                "id": "ru_openedu_teamwork",
-                "title": "Командная работа",
-                "url": "https://openedu.ru/course/ITMOUniversity/TEAMWORK/",
-                "type": "course",
-                "skill": "communication",
-            },
-            {
-                "id": "ru_4brain_ei_base",
-                "title": "Эмоциональный интеллект: основы и упражнения",
-                "url": "https://4brain.ru/emotion/",
-                "type": "article",
-                "skill": "emotional_intelligence",
-            },
-            {
-                "id": "ru_4brain_ei_article",
-                "title": "Как развить эмоциональный интеллект",
-                "url": "https://4brain.ru/blog/emotional-intellect/",
-                "type": "article",
-                "skill": "emotional_intelligence",
-            },
-            {
-                "id": "ru_stepik_ei",
-                "title": "Эмоциональный интеллект: ключ к успеху",
-                "url": "https://stepik.org/course/133690/promo",
-                "type": "course",
-                "skill": "emotional_intelligence",
-            },
-            {
-                "id": "ru_4brain_ct_base",
-                "title": "Критическое мышление: что это и как развивать",
-                "url": "https://4brain.ru/critical/",
-                "type": "article",
-                "skill": "critical_thinking",
-            },
-            {
-                "id": "ru_4brain_ct_skills",
-                "title": "Критическое мышление: навыки и свойства",
-                "url": "https://4brain.ru/critical/navyk.php",
-                "type": "article",
-                "skill": "critical_thinking",
-            },
-            {
-                "id": "ru_stepik_ct",
-                "title": "Критическое мышление",
-                "url": "https://stepik.org/course/63700/promo",
-                "type": "course",
-                "skill": "critical_thinking",
-            },
-            {
-                "id": "ru_postnauka_ct_video",
-                "title": "Критическое мышление",
-                "url": "https://postnauka.ru/tv/155334",
-                "type": "video",
-                "skill": "critical_thinking",
-            },
-            {
-                "id": "ru_4brain_tm_base",
-                "title": "Тайм-менеджмент: управление временем",
-                "url": "https://4brain.ru/time/",
-                "type": "article",
-                "skill": "time_management",
-            },
-            {
-                "id": "ru_4brain_tm_basics",
-                "title": "Тайм-менеджмент: основы",
-                "url": "https://4brain.ru/time/osnovy.php",
-                "type": "article",
-                "skill": "time_management",
-            },
-            {
-                "id": "ru_4brain_tm_psy",
-                "title": "Психологические аспекты тайм-менеджмента",
-                "url": "https://4brain.ru/blog/psihologiya-taym-menedzhmenta/",
-                "type": "article",
-                "skill": "time_management",
-            },
-            {
-                "id": "ru_openedu_tm_course",
-                "title": "Онлайн-курс: Тайм-менеджмент",
-                "url": "https://openedu.ru/course/misis/TMNG/",
-                "type": "course",
-                "skill": "time_management",
-            },
-            {
-                "id": "ru_stepik_tm",
-                "title": "Тайм-менеджмент",
-                "url": "https://stepik.org/course/102186/promo",
-                "type": "course",
-                "skill": "time_management",
-            },
-            {
-                "id": "ru_4brain_lead_base",
-                "title": "Лидерство: базовые принципы и подходы",
-                "url": "https://4brain.ru/liderstvo/",
-                "type": "article",
-                "skill": "leadership",
-            },
-            {
-                "id": "ru_4brain_lead_course",
-                "title": "Лидерство и мотивация: основы",
-                "url": "https://4brain.ru/management/leadership.php",
-                "type": "article",
-                "skill": "leadership",
-            },
-            {
-                "id": "ru_4brain_lead_practice",
-                "title": "Как быть лидером: практические советы",
-                "url": "https://4brain.ru/blog/kak-byt-liderom/",
-                "type": "article",
-                "skill": "leadership",
-            },
-            {
-                "id": "ru_openedu_lead_course",
-                "title": "Лидерство и командообразование",
-                "url": "https://openedu.ru/course/mephi/mephi_lfkpt/",
-                "type": "course",
-                "skill": "leadership",
-            },
-            {
-                "id": "ru_stepik_lead_team",
-                "title": "Лидерство и командообразование",
-                "url": "https://stepik.org/course/83003/promo",
-                "type": "course",
-                "skill": "leadership",
-            },
-        ]
+    def _curated_material_library(self) -> Tuple[Mapping[str, str], ...]:
+        return _CURATED_MATERIAL_LIBRARY
 
     def _material_domain(self, url: str) -> str:
-        parsed = urlparse(str(url or "").strip().lower())
-        return (parsed.netloc or "").lstrip("www.")
+        return _url_domain(str(url or ""))
 
     def _weakness_to_skill(self, weakness: str) -> Optional[str]:
         w = str(weakness or "").lower()
-        if "тайм" in w or "времен" in w:
-            return "time_management"
-        if "крит" in w:
-            return "critical_thinking"
-        if "коммуник" in w or "общен" in w:
-            return "communication"
-        if "эмоцион" in w:
-            return "emotional_intelligence"
-        if "лидер" in w:
-            return "leadership"
+        for tokens, skill in _WEAKNESS_SKILL_TOKENS:
+            if any(token in w for token in tokens):
+                return skill
         return None
 
-    def _extract_previous_material_ids(self, plans: List[DevelopmentPlan]) -> set[str]:
-        ids: set[str] = set()
-        for p in plans:
-            content = p.content
-            if not isinstance(content, dict):
-                continue
-            mats = content.get("materials")
-            if not isinstance(mats, list):
-                continue
-            for m in mats:
-                if isinstance(m, dict) and m.get("id"):
-                    ids.add(str(m.get("id")))
-        return ids
+    def _extract_previous_material_ids(self, contents: Iterable[Any]) -> set[str]:
+        material_lists = (
+            content.get("materials") if isinstance(content, dict) else None
+            for content in contents
+        )
+        return {
+            str(m["id"])
+            for mats in material_lists
+            if isinstance(mats, list)
+            for m in mats
+            if isinstance(m, dict) and m.get("id")
+        }
 
     def _select_curated_materials(
         self,
         weaknesses: List[str],
         target_difficulty: str,
-        previous_plans: List[DevelopmentPlan],
+        previous_contents: Iterable[Any],
         limit: int = 7,
     ) -> List[MaterialItem]:
         library = self._curated_material_library()
-        used_ids = self._extract_previous_material_ids(previous_plans)
+        used_ids = self._extract_previous_material_ids(previous_contents)
 
         max_per_domain = 3
 
@@ -1315,61 +1491,57 @@ class PlanService:
             if skill not in skill_order:
                 skill_order.append(skill)
 
-        picked: List[Dict[str, str]] = []
+        picked: List[Mapping[str, str]] = []
+        picked_ids: set[str] = set()
+        # Positions of articles in picked, in order; the last one is replaced first.
+        article_indices: List[int] = []
         domain_counts: Dict[str, int] = {}
 
-        def _can_take(candidate: Dict[str, str], ignore_domain_limit: bool = False) -> bool:
+        def _can_take(candidate: Mapping[str, str], ignore_domain_limit: bool = False) -> bool:
             if candidate.get("id") in used_ids:
                 return False
-            if candidate in picked:
+            if candidate.get("id") in picked_ids:
                 return False
-            domain = self._material_domain(candidate.get("url", ""))
+            domain = candidate["_domain"]
             if not domain:
                 return False
             if ignore_domain_limit:
                 return True
             return domain_counts.get(domain, 0) < max_per_domain
 
-        def _take(candidate: Dict[str, str]) -> None:
+        def _take(candidate: Mapping[str, str]) -> None:
+            if str(candidate.get("type")) == "article":
+                article_indices.append(len(picked))
             picked.append(candidate)
-            domain = self._material_domain(candidate.get("url", ""))
+            picked_ids.add(str(candidate.get("id")))
+            domain = candidate["_domain"]
             domain_counts[domain] = domain_counts.get(domain, 0) + 1
 
-        for skill in skill_order:
-            candidates = [m for m in library if m.get("skill") == skill]
-            for m in candidates:
-                if len(picked) >= limit:
-                    break
-                if not _can_take(m):
-                    continue
-                _take(m)
+        # Candidates in priority order, each paired with whether the domain limit is relaxed:
+        # weak skills first, then anything outside skill_order, then the whole library
+        # without the domain limit. A candidate rejected under the limit stays rejected
+        # until the relaxed pass, so re-scanning the skill buckets is unnecessary.
+        ordered_candidates = itertools.chain(
+            ((m, False) for skill in skill_order for m in _CURATED_LIBRARY_BY_SKILL.get(skill, ())),
+            ((m, False) for m in library if m.get("skill") not in skill_order),
+            ((m, True) for m in library),
+        )
+        for m, ignore_domain_limit in ordered_candidates:
             if len(picked) >= limit:
                 break
-
-        if len(picked) < limit:
-            for m in library:
-                if len(picked) >= limit:
-                    break
-                if not _can_take(m):
-                    continue
-                _take(m)
-
-        if len(picked) < limit:
-            for m in library:
-                if len(picked) >= limit:
-                    break
-                if not _can_take(m, ignore_domain_limit=True):
-                    continue
+            if _can_take(m, ignore_domain_limit=ignore_domain_limit):
                 _take(m)
 
         picked_types = {str(m.get("type")) for m in picked}
-        need_types = [t for t in ["course", "video"] if t not in picked_types]
+        # Kept ordered (course before video): a set difference would make the replaced
+        # articles depend on per-process string hashing.
+        need_types = [t for t in ("course", "video") if t not in picked_types]
         for t in need_types:
             replacement = next(
                 (
                     m
-                    for m in library
-                    if str(m.get("type")) == t and _can_take(m)
+                    for m in _CURATED_LIBRARY_BY_TYPE.get(t, ())
+                    if _can_take(m)
                 ),
                 None,
             )
@@ -1378,18 +1550,16 @@ class PlanService:
             if len(picked) < limit:
                 _take(replacement)
             else:
-                replace_idx = next(
-                    (i for i, m in enumerate(reversed(picked)) if str(m.get("type")) == "article"),
-                    None,
-                )
-                if replace_idx is None:
+                if not article_indices:
                     continue
-                idx = len(picked) - 1 - int(replace_idx)
+                idx = article_indices.pop()
                 removed = picked[idx]
-                removed_domain = self._material_domain(removed.get("url", ""))
+                removed_domain = removed["_domain"]
                 domain_counts[removed_domain] = max(0, domain_counts.get(removed_domain, 1) - 1)
                 picked[idx] = replacement
-                replacement_domain = self._material_domain(replacement.get("url", ""))
+                picked_ids.discard(str(removed.get("id")))
+                picked_ids.add(str(replacement.get("id")))
+                replacement_domain = replacement["_domain"]
                 domain_counts[replacement_domain] = domain_counts.get(replacement_domain, 0) + 1
 
         return [
@@ -1410,7 +1580,7 @@ class PlanService:
             return True
         if not (value.startswith("http://") or value.startswith("https://")):
             return True
-        if any(token in value for token in ["example.com", "en.wikipedia.org", "ted.com", "skillbox.ru"]):
+        if any(token in value for token in _BAD_MATERIAL_URL_TOKENS):
             return True
         parsed = urlparse(value)
         if not parsed.netloc:
@@ -1420,25 +1590,31 @@ class PlanService:
     def _plan_materials_need_diversity_refresh(self, materials: List[Dict[str, Any]]) -> bool:
         if not materials or not isinstance(materials, list):
             return True
+        if len(materials) < 3:
+            return False
 
-        domains = {
-            self._material_domain(str(m.get("url")))
-            for m in materials
-            if isinstance(m, dict) and m.get("url")
-        }
-        domains.discard("")
-
-        types = {
-            str(m.get("type"))
-            for m in materials
-            if isinstance(m, dict) and m.get("type")
-        }
+        domains: set[str] = set()
+        has_article = False
+        has_non_article = False
+        for m in materials:
+            if not isinstance(m, dict):
+                continue
+            if m.get("url"):
+                domain = self._material_domain(str(m.get("url")))
+                if domain:
+                    domains.add(domain)
+            if m.get("type"):
+                if str(m.get("type")) == "article":
+                    has_article = True
+                else:
+                    has_non_article = True
+            # Diverse enough already: nothing later in the list can trigger a refresh.
+            if has_non_article and len(domains) >= 2:
+                return False
 
-        if len(domains) <= 1 and len(materials) >= 3:
+        if len(domains) <= 1:
             return True
-        if types == {"article"} and len(materials) >= 3:
-            return True
-        return False
+        return has_article and not has_non_article
 
     async def sanitize_plan_materials_if_needed(
         self,
@@ -1463,21 +1639,23 @@ class PlanService:
             return False
 
         weaknesses = await self._identify_weaknesses(profile)
-        previous_plans_result = await db.execute(
-            select(DevelopmentPlan)
+        # Only material ids are needed here, so skip hydrating full plan rows.
+        previous_contents_result = await db.execute(
+            select(DevelopmentPlan.content)
             .where(DevelopmentPlan.user_id == plan.user_id, DevelopmentPlan.id != plan.id)
             .order_by(desc(DevelopmentPlan.generated_at))
             .limit(3)
         )
-        previous_plans = list(previous_plans_result.scalars().all())
+        previous_contents = previous_contents_result.scalars().all()
         target_difficulty = self._resolve_target_difficulty(profile)
-        curated = self._select_curated_materials(weaknesses, target_difficulty, previous_plans)
-        content["materials"] = jsonable_encoder([m.dict() for m in curated])
+        curated = self._select_curated_materials(weaknesses, target_difficulty, previous_contents)
+        # MaterialItem only has string fields, so .dict() is already JSON-safe.
+        content["materials"] = [m.dict() for m in curated]
         content["target_difficulty"] = target_difficulty
-        plan.content = jsonable_encoder(content)
+        self.reset_tracking_cache(content)
+        plan.content = content
         flag_modified(plan, "content")
         await db.commit()
-        await db.refresh(plan)
         return True
 
     def _resolve_target_difficulty(self, profile: SoftSkillsProfile) -> str:
@@ -1520,20 +1698,23 @@ class PlanService:
         self,
         user_id: int,
         profile: SoftSkillsProfile,
-        db: AsyncSession
+        db: AsyncSession,
+        deadline: Optional[float] = None
     ) -> Optional[DevelopmentPlan]:
         """
         Check if a new development plan should be generated and generate it if needed.
         
         Conditions for generation:
-        - More than 7 days since last plan generation
-        - No active plan exists
+        - More than 7 days since last plan generation, or no active plan exists,
+          or the current plan's block is completed
         - User has at least 3 completed analyses
         
         Args:
             user_id: User ID
             profile: User's current soft skills profile
             db: Database session
+            deadline: Event loop time by which the LLM plan request must finish; the
+                fallback plan is used once it passes
             
         Returns:
             Optional[DevelopmentPlan]: Newly generated plan or None if conditions not met
@@ -1541,22 +1722,10 @@ class PlanService:
         Requirements: 3.1, 6.5
         Property 6: Development Plan Generation Trigger
         """
-        # Check if user has enough completed analyses (Requirement 6.5)
-        analysis_count_result = await db.execute(
-            select(func.count(AnalysisResult.id))
-            .where(AnalysisResult.user_id == user_id)
-        )
-        analysis_count = analysis_count_result.scalar()
-
-        min_required = settings.MIN_ANALYSES_FOR_PLAN
-        if analysis_count < min_required:
-            logger.info(
-                f"User {user_id} has only {analysis_count} analyses. Need at least {min_required} for plan generation."
-            )
-            return None
-        
         # Check for existing active plan
         active_plan = await self.get_active_plan(user_id, db)
+        # Resolved once and shared by the regeneration check and plan generation.
+        target_difficulty = self._resolve_target_difficulty(profile)
         
         # Check if we need to generate a new plan
         should_generate = False
@@ -1578,7 +1747,9 @@ class PlanService:
                 should_generate = True
             else:
                 # Check if plan should be regenerated based on progress
-                if await self._should_regenerate_plan(active_plan, profile, db):
+                if await self._should_regenerate_plan(
+                    active_plan, profile, db, target_difficulty=target_difficulty
+                ):
                     logger.info(f"Plan regeneration triggered for user {user_id} based on progress.")
                     should_generate = True
         
@@ -1586,8 +1757,26 @@ class PlanService:
             logger.info(f"No plan generation needed for user {user_id}.")
             return None
         
+        # Check if user has enough completed analyses (Requirement 6.5). Runs after the
+        # plan checks: most analyses leave a fresh active plan in place, so the count is
+        # only needed when a plan is about to be generated.
+        analysis_count_result = await db.execute(
+            select(func.count(AnalysisResult.id))
+            .where(AnalysisResult.user_id == user_id)
+        )
+        analysis_count = analysis_count_result.scalar()
+
+        min_required = settings.MIN_ANALYSES_FOR_PLAN
+        if analysis_count < min_required:
+            logger.info(
+                f"User {user_id} has only {analysis_count} analyses. Need at least {min_required} for plan generation."
+            )
+            return None
+        
         # Generate new plan
-        return await self._generate_new_plan(user_id, profile, db)
+        return await self._generate_new_plan(
+            user_id, profile, db, target_difficulty=target_difficulty, deadline=deadline
+        )
     
     async def mark_task_completed(
         self,
@@ -1639,22 +1828,19 @@ class PlanService:
             tasks = []
             content["tasks"] = tasks
         
-        task_found = False
-        for task in tasks:
-            if str(task.get("id")) == str(task_id):
-                task["status"] = "completed"
-                task["completed_at"] = datetime.now(timezone.utc).isoformat()
-                task_found = True
-                logger.info(f"Marked task {task_id} as completed in plan {plan_id}")
-                break
-        
-        if not task_found:
+        now_iso = datetime.now(timezone.utc).isoformat()
+        task_key = str(task_id)
+        task = next((item for item in tasks if str(item.get("id")) == task_key), None)
+        if task is None:
             raise ValueError(f"Task {task_id} not found in plan {plan_id}")
+
+        task["status"] = "completed"
+        task["completed_at"] = now_iso
+        logger.info(f"Marked task {task_id} as completed in plan {plan_id}")
         
-        plan.content = jsonable_encoder(content)
+        plan.content = content
         flag_modified(plan, "content")
         await db.commit()
-        await db.refresh(plan)
         
         return plan
 
@@ -1688,7 +1874,9 @@ class PlanService:
             materials = []
             content["materials"] = materials
 
-        if not any(str(material.get("id")) == str(material_id) for material in materials if isinstance(material, dict)):
+        material_key = str(material_id)
+        known_material_ids = {str(material.get("id")) for material in materials if isinstance(material, dict)}
+        if material_key not in known_material_ids:
             raise ValueError(f"Material {material_id} not found in plan {plan_id}")
 
         material_progress = content.get("material_progress")
@@ -1696,21 +1884,18 @@ class PlanService:
             material_progress = {}
             content["material_progress"] = material_progress
 
-        entry = material_progress.get(str(material_id))
+        now_iso = datetime.now(timezone.utc).isoformat()
+        entry = material_progress.setdefault(material_key, {})
         if not isinstance(entry, dict):
             entry = {}
+            material_progress[material_key] = entry
         entry["article_opened"] = True
-        entry.setdefault("article_opened_at", datetime.now(timezone.utc).isoformat())
-        entry["percentage"] = self._material_progress_percentage(
-            bool(entry.get("article_opened")),
-            bool(entry.get("test_completed")),
-        )
-        material_progress[str(material_id)] = entry
+        entry.setdefault("article_opened_at", now_iso)
+        entry["percentage"] = _MATERIAL_PROGRESS_PERCENTAGE[(True, bool(entry.get("test_completed")))]
 
-        plan.content = jsonable_encoder(content)
+        plan.content = content
         flag_modified(plan, "content")
         await db.commit()
-        await db.refresh(plan)
         return plan
     
     async def get_active_plan(
@@ -1731,16 +1916,7 @@ class PlanService:
         Requirements: 4.4
         Property 12: Plan Response Completeness
         """
-        result = await db.execute(
-            select(DevelopmentPlan)
-            .where(
-                and_(
-                    DevelopmentPlan.user_id == user_id,
-                    DevelopmentPlan.is_archived == False
-                )
-            )
-            .order_by(desc(DevelopmentPlan.generated_at))
-        )
+        result = await db.execute(_ACTIVE_PLAN_BY_USER, {"user_id": user_id})
         plan = result.scalar_one_or_none()
         if plan is not None and isinstance(plan.content, dict):
             plan.content = self._repair_payload_encoding(plan.content)
@@ -1751,7 +1927,8 @@ class PlanService:
         self,
         plan: DevelopmentPlan,
         profile: SoftSkillsProfile,
-        db: AsyncSession
+        db: AsyncSession,
+        target_difficulty: Optional[str] = None,
     ) -> bool:
         """
         Determine if a plan should be regenerated based on user progress.
@@ -1764,6 +1941,7 @@ class PlanService:
             plan: Current development plan
             profile: Current user profile
             db: Database session
+            target_difficulty: Difficulty already resolved for this profile, if known
             
         Returns:
             bool: True if plan should be regenerated
@@ -1785,7 +1963,7 @@ class PlanService:
         if not bool(final_stage.get("level_up_applied")):
             return False
 
-        current_target_difficulty = self._resolve_target_difficulty(profile)
+        current_target_difficulty = target_difficulty or self._resolve_target_difficulty(profile)
         plan_target_difficulty = self._infer_plan_difficulty(content)
         if plan_target_difficulty and plan_target_difficulty != current_target_difficulty:
             logger.info(
@@ -1806,7 +1984,9 @@ class PlanService:
         self,
         user_id: int,
         profile: SoftSkillsProfile,
-        db: AsyncSession
+        db: AsyncSession,
+        target_difficulty: Optional[str] = None,
+        deadline: Optional[float] = None,
     ) -> DevelopmentPlan:
         """
         Generate a new development plan for the user.
@@ -1823,6 +2003,8 @@ class PlanService:
             user_id: User ID
             profile: User's current profile
             db: Database session
+            target_difficulty: Difficulty already resolved for this profile, if known
+            deadline: Event loop time by which the LLM plan request must finish
             
         Returns:
             DevelopmentPlan: Newly created development plan
@@ -1839,34 +2021,37 @@ class PlanService:
         # Step 2: Identify weaknesses
         weaknesses = await self._identify_weaknesses(profile)
 
-        target_difficulty = self._resolve_target_difficulty(profile)
+        if target_difficulty is None:
+            target_difficulty = self._resolve_target_difficulty(profile)
         
-        # Step 3: Get previous plans for material uniqueness check
-        previous_plans_result = await db.execute(
-            select(DevelopmentPlan)
-            .where(DevelopmentPlan.user_id == user_id)
-            .order_by(desc(DevelopmentPlan.generated_at))
-            .limit(3)  # Consider last 3 plans
-        )
-        previous_plans = previous_plans_result.scalars().all()
+        # Step 3: Get previous plans for material uniqueness check.
+        # Achievements and uniqueness use the same ordering, so one query serves both.
         achievement_plans_result = await db.execute(
             select(DevelopmentPlan)
             .where(DevelopmentPlan.user_id == user_id)
             .order_by(desc(DevelopmentPlan.generated_at))
             .limit(100)
         )
-        achievement_plans = achievement_plans_result.scalars().all()        
+        achievement_plans = achievement_plans_result.scalars().all()
+        previous_plans = achievement_plans[:3]  # Consider last 3 plans
         # Step 4: Generate plan using LLM (Requirements 3.2, 3.3, 3.4)
         yandex_folder_id = str(settings.YANDEX_FOLDER_ID or "").strip()
         yandex_api_key = str(settings.YANDEX_API_KEY or "").strip()
         try:
             if not yandex_folder_id or not yandex_api_key:
                 raise RuntimeError("Yandex LLM configuration is incomplete")
-            plan_content = await self.llm_service.generate_development_plan(
+            llm_request = self.llm_service.generate_development_plan(
                 profile=profile,
                 weaknesses=weaknesses,
                 history=list(previous_plans)
             )
+            if deadline is not None:
+                # Only the LLM request is cancelled: it holds no database state, and a
+                # timeout falls back to the static plan below like any other LLM error.
+                remaining = deadline - asyncio.get_running_loop().time()
+                plan_content = await asyncio.wait_for(llm_request, timeout=max(0.0, remaining))
+            else:
+                plan_content = await llm_request
         except Exception as e:
             logger.error(f"Failed to generate plan via LLM for user {user_id}: {e}")
             plan_content = DevelopmentPlanContent(
@@ -1932,7 +2117,7 @@ class PlanService:
         plan_content.materials = self._select_curated_materials(
             weaknesses=weaknesses,
             target_difficulty=target_difficulty,
-            previous_plans=list(previous_plans),
+            previous_contents=[p.content for p in previous_plans],
         )
 
         plan_content.recommended_tests = await self._select_recommended_tests(
@@ -1972,23 +2157,44 @@ class PlanService:
         target_difficulty: str,
         db: AsyncSession,
     ) -> List[TestRecommendation]:
-        query = await db.execute(select(Test).where(Test.type != "simulation").order_by(Test.id.asc()))
-        tests = [t for t in list(query.scalars().all()) if not self._is_final_test(t)]
-        if not tests:
-            return []
-
         preferred_type = "case" if str(target_difficulty).lower() == "advanced" else "quiz"
-        preferred = [t for t in tests if str(t.type).lower() == preferred_type]
-        others = [t for t in tests if t not in preferred]
-        tests = preferred + others
+        generated_final_titles = [
+            title_builder(level)
+            for level in ("beginner", "intermediate", "advanced")
+            for title_builder in (
+                self._final_test_title,
+                self._legacy_final_test_title,
+                self._final_simulation_title,
+                self._legacy_final_simulation_title,
+            )
+        ]
+        # Generated final tests are dropped in SQL and the preferred type is ordered
+        # first there; the Python check below still catches legacy/mis-encoded titles.
+        query = await db.execute(
+            select(Test)
+            .where(
+                Test.type != "simulation",
+                or_(Test.title.is_(None), Test.title.not_in(generated_final_titles)),
+            )
+            .order_by(case((func.lower(Test.type) == preferred_type, 0), else_=1), Test.id.asc())
+        )
+        # Normalize each test's title/description once and reuse it for both the
+        # final-test check and the skill haystack.
+        test_hays: List[Tuple[Test, str]] = []
+        for t in query.scalars():
+            title = self._normalize_text(t.title)
+            description = self._normalize_text(t.description)
+            if self._is_final_normalized_title(title) or self._is_final_normalized_title(description):
+                continue
+            test_hays.append((t, f"{title} {description}"))
+        if not test_hays:
+            return []
+        tests = [t for t, _ in test_hays]
 
         all_test_ids: List[int] = []
         for t in tests:
-            try:
-                test_id = int(t.id)
-            except Exception:
-                continue
-            if test_id > 0:
+            test_id = self._safe_int(t.id)
+            if test_id is not None and test_id > 0:
                 all_test_ids.append(test_id)
         completed_test_ids = await self._get_completion_test_ids(
             user_id=user_id,
@@ -1996,65 +2202,62 @@ class PlanService:
             db=db,
         )
 
-        skill_keywords = self._skill_keywords()
-
         def _resolve_skill(weakness: str) -> Optional[str]:
             if not weakness:
                 return None
             normalized = self._normalize_text(weakness).replace("-", " ").replace("_", " ")
-            for skill, keywords in skill_keywords.items():
-                if any(keyword in normalized for keyword in keywords):
-                    return skill
-            return None
-
-        tests_by_skill: Dict[str, List[Test]] = {skill: [] for skill in skill_keywords.keys()}
-        for t in tests:
-            hay = f"{self._normalize_text(t.title)} {self._normalize_text(t.description)}"
-            matched_skill: Optional[str] = None
-            for skill, keywords in skill_keywords.items():
-                if any(keyword in hay for keyword in keywords):
-                    matched_skill = skill
-                    break
-            if matched_skill is not None:
-                tests_by_skill[matched_skill].append(t)
-
-        def _pick_from_candidates(candidates: List[Test], current: List[Test]) -> Optional[Test]:
-            preferred_fresh = [
-                t for t in candidates
-                if t not in current and int(t.id) not in completed_test_ids
-            ]
-            if preferred_fresh:
-                return preferred_fresh[0]
-            fallback = [t for t in candidates if t not in current]
-            if fallback:
-                return fallback[0]
-            return None
+            return self._match_skill(normalized)
+
+        # Skill buckets only matter when there are weaknesses to match against.
+        tests_by_skill: Dict[str, List[Test]] = {skill: [] for skill in _SKILL_KEYWORDS}
+        if weaknesses:
+            for t, hay in test_hays:
+                matched_skill = self._match_skill(hay)
+                if matched_skill is not None:
+                    tests_by_skill[matched_skill].append(t)
+
+        def _pick_from_candidates(candidates: List[Test], current_ids: set[int]) -> Optional[Test]:
+            # Stop at the first suitable candidate instead of filtering the whole bucket.
+            preferred_fresh = next(
+                (
+                    t for t in candidates
+                    if int(t.id) not in current_ids and int(t.id) not in completed_test_ids
+                ),
+                None,
+            )
+            if preferred_fresh is not None:
+                return preferred_fresh
+            return next((t for t in candidates if int(t.id) not in current_ids), None)
 
         picked: List[Test] = []
+        picked_ids: set[int] = set()
         for w in weaknesses:
             skill = _resolve_skill(w)
             if not skill:
                 continue
-            selected = _pick_from_candidates(tests_by_skill.get(skill, []), picked)
+            selected = _pick_from_candidates(tests_by_skill.get(skill, []), picked_ids)
             if selected is not None:
                 picked.append(selected)
+                picked_ids.add(int(selected.id))
             if len(picked) >= 3:
                 break
 
         for t in tests:
             if len(picked) >= 3:
                 break
-            if t in picked:
+            if int(t.id) in picked_ids:
                 continue
             if int(t.id) in completed_test_ids:
                 continue
             picked.append(t)
+            picked_ids.add(int(t.id))
 
         for t in tests:
             if len(picked) >= 3:
                 break
-            if t not in picked:
+            if int(t.id) not in picked_ids:
                 picked.append(t)
+                picked_ids.add(int(t.id))
 
         reason = "Рекомендуем пройти тесты, чтобы собрать больше данных и улучшить слабые навыки." if weaknesses else "Рекомендуем пройти тесты для накопления данных."
         return [
@@ -2081,21 +2284,21 @@ class PlanService:
         Requirements: 7.3
         Property 24: Plan Archival on Regeneration
         """
+        # Single UPDATE ... RETURNING instead of loading the row to flip the flag; the
+        # ORM-enabled update also syncs any copy of the plan already in the session.
         result = await db.execute(
-            select(DevelopmentPlan)
+            update(DevelopmentPlan)
             .where(
                 and_(
                     DevelopmentPlan.user_id == user_id,
                     DevelopmentPlan.is_archived == False
                 )
             )
+            .values(is_archived=True)
+            .returning(DevelopmentPlan.id)
         )
-        active_plan = result.scalar_one_or_none()
-        
-        if active_plan:
-            active_plan.is_archived = True
-            await db.flush()
-            logger.info(f"Archived plan {active_plan.id} for user {user_id}")
+        for archived_plan_id in result.scalars():
+            logger.info(f"Archived plan {archived_plan_id} for user {user_id}")
     
     async def _identify_weaknesses(
         self,
@@ -2112,21 +2315,15 @@ class PlanService:
             
         Requirements: 2.5
         """
-        skills = [
-            ("Тайм-менеджмент", profile.time_management_score),
-            ("Критическое мышление", profile.critical_thinking_score),
-            ("Коммуникация", profile.communication_score),
-            ("Эмоциональный интеллект", profile.emotional_intelligence_score),
-            ("Лидерство", profile.leadership_score),
-        ]
-        
-        # Sort by score (ascending) to get weaknesses
-        sorted_skills = sorted(skills, key=lambda x: x[1])
-        
-        # Return bottom 3 as weaknesses
-        weaknesses = [skill[0] for skill in sorted_skills[:3]]
-        
-        return weaknesses
+        # Bottom 3 by score (ascending, ties keep _WEAKNESS_LABELS order) as weaknesses
+        scores = (
+            profile.time_management_score,
+            profile.critical_thinking_score,
+            profile.communication_score,
+            profile.emotional_intelligence_score,
+            profile.leadership_score,
+        )
+        return list(_weakest_labels(scores))
     
     def _check_material_uniqueness(
         self,
@@ -2160,13 +2357,13 @@ class PlanService:
         if not new_material_ids:
             return True
         
-        # Calculate uniqueness
-        common_materials = new_material_ids.intersection(previous_material_ids)
-        unique_materials = new_material_ids - previous_material_ids
+        # Calculate uniqueness in one pass over the new ids
+        common_count = sum(1 for material_id in new_material_ids if material_id in previous_material_ids)
+        unique_count = len(new_material_ids) - common_count
         
-        uniqueness_percentage = (len(unique_materials) / len(new_material_ids)) * 100
+        uniqueness_percentage = (unique_count / len(new_material_ids)) * 100
         
-        logger.info(f"Material uniqueness: {uniqueness_percentage:.1f}% ({len(unique_materials)}/{len(new_material_ids)} unique)")
+        logger.info(f"Material uniqueness: {uniqueness_percentage:.1f}% ({unique_count}/{len(new_material_ids)} unique)")
         
         return uniqueness_percentage >= 70
 
@@ -1,14 +1,62 @@
+import heapq
+from functools import lru_cache
+from operator import itemgetter
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, insert, update, and_, bindparam, func
+from sqlalchemy.sql.selectable import CTE
+from sqlalchemy.orm import raiseload, selectinload
 
 from app.models.analysis import AnalysisResult
 from app.models.profile import SoftSkillsProfile, ProfileHistory
 from app.schemas.analysis import SkillScores
 from app.schemas.profile import ProfileWithHistory, StrengthsWeaknesses
 
+# SkillScores field -> SoftSkillsProfile column, in the profile's column order.
+_SCORE_FIELDS = (
+    ("communication", "communication_score"),
+    ("emotional_intelligence", "emotional_intelligence_score"),
+    ("critical_thinking", "critical_thinking_score"),
+    ("time_management", "time_management_score"),
+    ("leadership", "leadership_score"),
+)
+
+# Built once with bound parameters and reused on every request.
+_PROFILE_BY_USER = select(SoftSkillsProfile).where(SoftSkillsProfile.user_id == bindparam("user_id"))
+# History is read as plain columns: the endpoint never needs ProfileHistory instances,
+# so rows skip ORM hydration and identity-map bookkeeping.
+_HISTORY_COLUMNS = (
+    ProfileHistory.id,
+    ProfileHistory.user_id,
+    ProfileHistory.profile_id,
+    ProfileHistory.communication_score,
+    ProfileHistory.emotional_intelligence_score,
+    ProfileHistory.critical_thinking_score,
+    ProfileHistory.time_management_score,
+    ProfileHistory.leadership_score,
+    ProfileHistory.created_at,
+)
+_PROFILE_WITH_HISTORY_BY_USER = (
+    select(SoftSkillsProfile, *_HISTORY_COLUMNS)
+    .outerjoin(
+        ProfileHistory,
+        and_(
+            ProfileHistory.user_id == SoftSkillsProfile.user_id,
+            ProfileHistory.created_at >= bindparam("cutoff_date")
+        )
+    )
+    .options(raiseload("*"))
+    .where(SoftSkillsProfile.user_id == bindparam("user_id"))
+    .order_by(ProfileHistory.created_at.desc())
+)
+
+
+@lru_cache(maxsize=32)
+def _history_window(months: int) -> timedelta:
+    # The endpoint only accepts 1-24 months, so the window deltas are reused.
+    return timedelta(days=months * 30)
+
 
 class ProfileService:
     """Service for managing Soft Skills profiles and their history"""
@@ -38,9 +86,7 @@ class ProfileService:
         Requirements: 2.1, 2.2, 7.2
         """
         # Get or create profile
-        result = await db.execute(
-            select(SoftSkillsProfile).where(SoftSkillsProfile.user_id == user_id)
-        )
+        result = await db.execute(_PROFILE_BY_USER, {"user_id": user_id})
         profile = result.scalar_one_or_none()
         
         if profile is None:
@@ -54,43 +100,32 @@ class ProfileService:
                 leadership_score=new_scores.leadership
             )
             db.add(profile)
+            # flush() assigns the primary key; the scores are already set in Python,
+            # so no refresh round-trip is needed.
             await db.flush()
-            await db.refresh(profile)
             return profile
         
-        # Save current state to history before updating (Requirement 2.2, 7.2)
-        await self._save_profile_history(profile, db)
-
         w = max(0.0, min(1.0, float(weight or 0.0)))
 
-        profile.communication_score = self._calculate_weighted_average(
-            float(profile.communication_score or 0.0),
-            float(new_scores.communication or 0.0),
-            w,
-        )
-        profile.emotional_intelligence_score = self._calculate_weighted_average(
-            float(profile.emotional_intelligence_score or 0.0),
-            float(new_scores.emotional_intelligence or 0.0),
-            w,
-        )
-        profile.critical_thinking_score = self._calculate_weighted_average(
-            float(profile.critical_thinking_score or 0.0),
-            float(new_scores.critical_thinking or 0.0),
-            w,
-        )
-        profile.time_management_score = self._calculate_weighted_average(
-            float(profile.time_management_score or 0.0),
-            float(new_scores.time_management or 0.0),
-            w,
-        )
-        profile.leadership_score = self._calculate_weighted_average(
-            float(profile.leadership_score or 0.0),
-            float(new_scores.leadership or 0.0),
-            w,
-        )
+        new_values = {
+            column: self._calculate_weighted_average(
+                float(getattr(profile, column) or 0.0),
+                float(getattr(new_scores, score_field) or 0.0),
+                w,
+            )
+            for score_field, column in _SCORE_FIELDS
+        }
         
-        await db.flush()
-        await db.refresh(profile)
+        # Save current state to history and apply the new scores in one statement
+        # (Requirement 2.2, 7.2): the snapshot INSERT runs as a data-modifying CTE of
+        # the UPDATE and reads the pre-update row. The ORM-enabled update also
+        # refreshes the loaded profile's attributes with the new values.
+        await db.execute(
+            update(SoftSkillsProfile)
+            .where(SoftSkillsProfile.id == profile.id)
+            .values(**new_values)
+            .add_cte(self._profile_history_snapshot(profile))
+        )
         return profile
     
     async def get_profile_with_history(
@@ -112,29 +147,28 @@ class ProfileService:
             
         Requirements: 2.3, 2.4, 2.5, 7.4
         """
-        # Get current profile
+        # Fetch the profile and its history for the time range (Requirement 7.4) in one
+        # round-trip: the history is outer-joined so a profile without snapshots still
+        # yields a single row. The response only reads score columns, so relationship
+        # lazy loads are turned into errors instead of hidden per-row queries.
+        cutoff_date = datetime.now(timezone.utc) - _history_window(months)
         result = await db.execute(
-            select(SoftSkillsProfile).where(SoftSkillsProfile.user_id == user_id)
+            _PROFILE_WITH_HISTORY_BY_USER,
+            {"user_id": user_id, "cutoff_date": cutoff_date},
         )
-        profile = result.scalar_one_or_none()
+        # Consume the rows once. History columns come back as row mappings keyed by
+        # the schema field names, so they are passed through as-is instead of being
+        # copied into per-row dicts.
+        profile: Optional[SoftSkillsProfile] = None
+        history = []
+        for row in result.mappings():
+            profile = row["SoftSkillsProfile"]
+            if row["id"] is not None:
+                history.append(row)
         
         if profile is None:
             return None
         
-        # Get history for specified time range (Requirement 7.4)
-        cutoff_date = datetime.utcnow() - timedelta(days=months * 30)
-        history_result = await db.execute(
-            select(ProfileHistory)
-            .where(
-                and_(
-                    ProfileHistory.user_id == user_id,
-                    ProfileHistory.created_at >= cutoff_date
-                )
-            )
-            .order_by(ProfileHistory.created_at.desc())
-        )
-        history_records = history_result.scalars().all()
-        
         # Build current scores dict
         current_scores = {
             "communication": profile.communication_score,
@@ -149,20 +183,7 @@ class ProfileService:
         
         return ProfileWithHistory(
             current=current_scores,
-            history=[
-                {
-                    "id": h.id,
-                    "user_id": h.user_id,
-                    "profile_id": h.profile_id,
-                    "communication_score": h.communication_score,
-                    "emotional_intelligence_score": h.emotional_intelligence_score,
-                    "critical_thinking_score": h.critical_thinking_score,
-                    "time_management_score": h.time_management_score,
-                    "leadership_score": h.leadership_score,
-                    "created_at": h.created_at
-                }
-                for h in history_records
-            ],
+            history=history,
             strengths=strengths_weaknesses.strengths,
             weaknesses=strengths_weaknesses.weaknesses
         )
@@ -191,20 +212,14 @@ class ProfileService:
             ("leadership", "Лидерство", profile.leadership_score)
         ]
 
-        # Sort by score
-        sorted_skills = sorted(skills, key=lambda x: x[2], reverse=True)
-
-        # Avoid overlap between strengths and weaknesses
-        strengths_slice = sorted_skills[: min(3, len(sorted_skills))]
+        # Top 3 by score; ties keep list order
+        strengths_slice = heapq.nlargest(3, skills, key=itemgetter(2))
         strength_keys = {skill[0] for skill in strengths_slice}
 
-        weaknesses_labels = []
-        for key, label, _ in reversed(sorted_skills):
-            if key in strength_keys:
-                continue
-            weaknesses_labels.append(label)
-            if len(weaknesses_labels) >= 3:
-                break
+        # Lowest of the remaining skills, so strengths and weaknesses never overlap.
+        # Scanning in reverse keeps tied weaknesses in the same order as before.
+        remaining = [skill for skill in reversed(skills) if skill[0] not in strength_keys]
+        weaknesses_labels = [skill[1] for skill in heapq.nsmallest(3, remaining, key=itemgetter(2))]
 
         strengths_labels = [skill[1] for skill in strengths_slice]
 
@@ -240,32 +255,36 @@ class ProfileService:
         # Clamp to [0, 100] to guarantee bounds (Property 3)
         return max(0.0, min(100.0, result))
     
-    async def _save_profile_history(
+    def _profile_history_snapshot(
         self,
-        profile: SoftSkillsProfile,
-        db: AsyncSession
-    ) -> None:
+        profile: SoftSkillsProfile
+    ) -> CTE:
         """
-        Save current profile state to history before updating.
+        Build the INSERT that snapshots the stored profile row into history.
         
         Args:
             profile: Current profile to snapshot
-            db: Database session
+            
+        Returns:
+            INSERT ... SELECT as a CTE, to be attached to the profile UPDATE
             
         Requirements: 2.2, 7.2
         Property 23: Profile history snapshot must be created before each update
         """
-        history_entry = ProfileHistory(
-            user_id=profile.user_id,
-            profile_id=profile.id,
-            communication_score=profile.communication_score,
-            emotional_intelligence_score=profile.emotional_intelligence_score,
-            critical_thinking_score=profile.critical_thinking_score,
-            time_management_score=profile.time_management_score,
-            leadership_score=profile.leadership_score
+        score_columns = [column for _, column in _SCORE_FIELDS]
+        return (
+            insert(ProfileHistory)
+            .from_select(
+                ["user_id", "profile_id", *score_columns],
+                select(
+                    SoftSkillsProfile.user_id,
+                    SoftSkillsProfile.id,
+                    *(getattr(SoftSkillsProfile, column) for column in score_columns),
+                ).where(SoftSkillsProfile.id == profile.id),
+            )
+            .returning(ProfileHistory.id)
+            .cte("profile_snapshot")
         )
-        db.add(history_entry)
-        await db.flush()
 
 
 profile_service = ProfileService()
@@ -6,25 +6,64 @@ using FastAPI BackgroundTasks for serverless deployment compatibility.
 """
 
 import asyncio
+import hashlib
 import logging
-from typing import Dict, Any
+import re
+from collections import OrderedDict, defaultdict, deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from datetime import datetime, timezone
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, update, and_, exists
+from sqlalchemy.orm import joinedload, selectinload
 
+from app.core.config import settings
 from app.db.session import AsyncSessionLocal
 from app.models.analysis import AnalysisTask, AnalysisResult
 from app.models.chat import ChatMessage, ChatAudio
 from app.models.content import UserTestResult, CaseSolution, Test
 from app.models.profile import SoftSkillsProfile
-from app.services.llm_service import LLMService, LLMUnavailableError, LLMRateLimitError, LLMInvalidResponseError
-from app.services.profile_service import ProfileService
-from app.services.plan_service import PlanService
+from app.services.llm_service import (
+    LLMService,
+    LLMUnavailableError,
+    LLMRateLimitError,
+    LLMInvalidResponseError,
+    llm_service,
+)
+from app.services.profile_service import profile_service
+from app.services.plan_service import plan_service
 from app.schemas.analysis import SkillScores
 
 logger = logging.getLogger(__name__)
 
+# Users whose failed analyses are retried at the same time
+_RETRY_CONCURRENCY = 8
+
+# Caps concurrent LLM analyses so request bursts queue here instead of tripping
+# the provider's rate limits and filling the retry queue.
+_LLM_SEMAPHORE = asyncio.Semaphore(max(1, int(settings.LLM_MAX_INFLIGHT)))
+
+# Time budgets (seconds) for one analysis run (Requirement 6.1, 6.3)
+_ANALYSIS_TIMEOUT_SECONDS = 120.0
+_RETRY_TIMEOUT_SECONDS = 30.0
+
+# Near-duplicate free-text answers ("ok", "thanks", restated messages) reuse the
+# user's recent analysis instead of another LLM call. Fingerprints are 64-bit
+# SimHashes of word unigrams and bigrams; at most 5 differing bits counts as the
+# same text (~0.92 similarity). Kept per process for the most recent users.
+_NEAR_DUPLICATE_MAX_BITS = 5
+_RECENT_ANALYSES_PER_USER = 20
+_RECENT_ANALYSES_MAX_USERS = 1024
+_RECENT_ANALYSES: "OrderedDict[int, deque[Tuple[int, Optional[str], SkillScores]]]" = OrderedDict()
+_WORD_RE = re.compile(r"\w+")
+
+# Whether a chat message was recorded as voice (has a ChatAudio row)
+_HAS_AUDIO = (
+    exists()
+    .where(ChatAudio.chat_message_id == ChatMessage.id)
+    .correlate(ChatMessage)
+    .label("has_audio")
+)
+
 
 async def process_analysis_background(
     task_id: str,
@@ -52,212 +91,130 @@ async def process_analysis_background(
     Requirements: 1.1, 1.2, 1.3, 1.4, 1.5, 2.1, 3.1
     """
     logger.info(
-        f"Background analysis task started: task_id={task_id}, "
-        f"user_id={user_id}, type={response_type}"
+        "Background analysis task started: task_id=%s, user_id=%s, type=%s",
+        task_id,
+        user_id,
+        response_type,
     )
     
     # Create a new database session for this background task
     async with AsyncSessionLocal() as db:
         try:
-            # Use timeout for serverless compatibility (Requirement 6.1, 6.3)
-            await asyncio.wait_for(
-                _process_analysis_with_db(task_id, user_id, response_type, response_data, db),
-                timeout=120.0
-            )
+            # Use a deadline for serverless compatibility (Requirement 6.1, 6.3). It is
+            # enforced cooperatively inside, so a timeout never cancels a statement
+            # half-way and the session can always be rolled back cleanly.
+            deadline = asyncio.get_running_loop().time() + _ANALYSIS_TIMEOUT_SECONDS
+            await _process_analysis_with_db(task_id, user_id, response_type, response_data, db, deadline)
             
         except asyncio.TimeoutError:
-            logger.error(f"Analysis task {task_id} timed out after 120 seconds")
-            # Update task status to failed
-            await _mark_task_failed(task_id, "Analysis timed out after 120 seconds", db)
+            timeout_message = f"Analysis timed out after {_ANALYSIS_TIMEOUT_SECONDS:g} seconds"
+            logger.error("Analysis task %s: %s", task_id, timeout_message)
+            # Drop partial writes, then update task status to failed
+            await db.rollback()
+            await _mark_task_failed(task_id, timeout_message, db)
             
         except Exception as e:
             logger.error(f"Error processing analysis task {task_id}: {str(e)}", exc_info=True)
-            # Update task status to failed
+            # Drop partial writes, then update task status to failed
+            await db.rollback()
             await _mark_task_failed(task_id, str(e), db)
 
 
+def _time_left(deadline: float) -> float:
+    """Seconds left before the deadline; raises asyncio.TimeoutError once it has passed."""
+    remaining = deadline - asyncio.get_running_loop().time()
+    if remaining <= 0:
+        raise asyncio.TimeoutError()
+    return remaining
+
+
+async def _call_llm(call: Callable[[], Awaitable[SkillScores]], deadline: float) -> SkillScores:
+    # The LLM request is the only step cancelled on timeout: it holds no database state.
+    async with _LLM_SEMAPHORE:
+        return await asyncio.wait_for(call(), timeout=_time_left(deadline))
+
+
 async def _process_analysis_with_db(
     task_id: str,
     user_id: int,
     response_type: str,
     response_data: Dict[str, Any],
-    db: AsyncSession
+    db: AsyncSession,
+    deadline: float
 ) -> None:
     """
     Internal function to process analysis with database session.
     
+    Raises asyncio.TimeoutError if the deadline (event loop time) passes before the
+    results are written.
+    
     Requirements: 1.5, 2.1, 3.1
     """
-    # Update task status to processing
+    # Claim the task with a compare-and-set: only a pending or failed task moves to
+    # processing, so duplicate runs (request retries, overlapping retry sweeps) return
+    # here instead of paying for a second LLM call and a second AnalysisResult.
+    # The claim is committed right away so clients polling the task see "processing"
+    # and no row lock or transaction is held across the LLM call.
     result = await db.execute(
-        select(AnalysisTask).where(AnalysisTask.id == task_id)
+        update(AnalysisTask)
+        .where(
+            and_(
+                AnalysisTask.id == task_id,
+                AnalysisTask.status.in_(("pending", "failed"))
+            )
+        )
+        .values(status="processing")
+        .returning(AnalysisTask.id)
     )
-    task = result.scalar_one_or_none()
-    
-    if not task:
-        logger.error(f"Analysis task {task_id} not found")
-        return
-    
-    task.status = "processing"
+    claimed = result.scalar_one_or_none()
     await db.commit()
     
-    # Step 1: Get response data from database (if needed)
-    text_to_analyze = None
-    context = None
-    
-    if response_type == "chat":
-        # Get chat message
-        message_id = response_data.get("response_id")
-        if message_id:
-            msg_result = await db.execute(
-                select(ChatMessage).where(ChatMessage.id == message_id)
-            )
-            chat_message = msg_result.scalar_one_or_none()
-            if chat_message:
-                text_to_analyze = chat_message.message
-                audio_row = await db.execute(
-                    select(ChatAudio).where(ChatAudio.chat_message_id == chat_message.id)
-                )
-                has_audio = audio_row.scalar_one_or_none() is not None
-                context = (
-                    "Анализ голосового сообщения пользователя (текст распознан из аудио; учитывай сарказм/иронию)"
-                    if has_audio
-                    else "Анализ текстового сообщения пользователя"
-                )
-        else:
-            text_to_analyze = response_data.get("message")
-            context = "Анализ текстового сообщения пользователя"
-    
-    elif response_type == "test":
-        test_id = response_data.get("test_id")
-        result_id = response_data.get("result_id")
-
-        answers = response_data.get("answers", {})
-        if result_id:
-            result_row = await db.execute(
-                select(UserTestResult).where(UserTestResult.id == int(result_id))
-            )
-            test_result = result_row.scalar_one_or_none()
-            if test_result:
-                answers = test_result.details or {}
-
-        response_data["answers"] = answers
-
-        context = f"Анализ результатов теста ID {test_id}"
-
-    elif response_type == "case":
-        solution_id = response_data.get("solution_id")
-        case_id = response_data.get("case_id")
-        if solution_id:
-            solution_row = await db.execute(
-                select(CaseSolution).where(CaseSolution.id == int(solution_id))
-            )
-            case_solution = solution_row.scalar_one_or_none()
-            if case_solution:
-                text_to_analyze = case_solution.solution
-        else:
-            text_to_analyze = response_data.get("solution")
-
-        context = f"Анализ решения кейса ID {case_id}"
+    if claimed is None:
+        logger.info("Analysis task %s not found, already completed or being processed", task_id)
+        return
     
-    # Step 2: Call LLMService for analysis (Requirement 1.5)
-    llm_service = LLMService()
+    # Steps 1-2: Load the response and call LLMService for analysis (Requirement 1.5).
+    # Response rows are loaded once and reused when the feedback is persisted.
     skill_scores = None
     
     try:
-        if response_type == "test":
-            test_id = response_data.get("test_id")
-            result_id = response_data.get("result_id")
-            answers = response_data.get("answers", {})
-
-            questions = []
-            if test_id:
-                test_row = await db.execute(
-                    select(Test).options(selectinload(Test.questions)).where(Test.id == int(test_id))
-                )
-                test_obj = test_row.scalar_one_or_none()
-                if test_obj and test_obj.questions:
-                    questions = [
-                        {"id": q.id, "text": q.text}
-                        for q in test_obj.questions
-                    ]
-
-            if not questions:
-                questions = [
-                    {"id": k, "text": f"Question {k}"}
-                    for k in answers.keys()
-                ]
-
-            skill_scores = await llm_service.analyze_test_answers(
-                test_type=f"test_{test_id}",
-                questions=questions,
-                answers=answers
-            )
-        else:
-            # For chat and case, analyze the text
-            if not text_to_analyze:
-                raise ValueError(f"No text to analyze for {response_type}")
-            
-            skill_scores = await llm_service.analyze_communication(
-                text=text_to_analyze,
-                context=context
-            )
+        analyze_response = _ANALYSIS_HANDLERS.get(response_type)
+        if analyze_response is None:
+            raise ValueError(f"Unsupported response type: {response_type}")
+        
+        skill_scores, persist_feedback = await analyze_response(user_id, response_data, llm_service, db, deadline)
         
-        logger.info(f"LLM analysis completed for task {task_id}: {skill_scores}")
+        logger.info("LLM analysis completed for task %s: %s", task_id, skill_scores)
         
     except LLMUnavailableError as e:
         # LLM is unavailable - save for retry (Requirement 6.1)
-        logger.error(f"LLM unavailable for task {task_id}: {str(e)}")
-        # Mark task as failed with clear message for retry
-        task.status = "failed"
-        task.error_message = f"LLM unavailable: {str(e)}"
-        task.retry_count += 1
-        await db.commit()
-        logger.info(f"Task {task_id} marked for retry (attempt {task.retry_count}/3)")
+        logger.error("LLM unavailable for task %s: %s", task_id, e)
+        retry_count = await _record_task_failure(task_id, f"LLM unavailable: {str(e)}", db)
+        logger.info("Task %s marked for retry (attempt %s/3)", task_id, retry_count)
         return
         
     except LLMRateLimitError as e:
         # Rate limit exceeded - save for retry (Requirement 6.1)
-        logger.error(f"Rate limit exceeded for task {task_id}: {str(e)}")
-        task.status = "failed"
-        task.error_message = f"Rate limit exceeded: {str(e)}"
-        task.retry_count += 1
-        await db.commit()
-        logger.info(f"Task {task_id} marked for retry due to rate limit (attempt {task.retry_count}/3)")
+        logger.error("Rate limit exceeded for task %s: %s", task_id, e)
+        retry_count = await _record_task_failure(task_id, f"Rate limit exceeded: {str(e)}", db)
+        logger.info("Task %s marked for retry due to rate limit (attempt %s/3)", task_id, retry_count)
         return
         
     except LLMInvalidResponseError as e:
         # Invalid response after retries - save for retry (Requirement 6.1)
-        logger.error(f"Invalid LLM response for task {task_id}: {str(e)}")
-        task.status = "failed"
-        task.error_message = f"Invalid response: {str(e)}"
-        task.retry_count += 1
-        await db.commit()
-        logger.info(f"Task {task_id} marked for retry due to invalid response (attempt {task.retry_count}/3)")
+        logger.error("Invalid LLM response for task %s: %s", task_id, e)
+        retry_count = await _record_task_failure(task_id, f"Invalid response: {str(e)}", db)
+        logger.info("Task %s marked for retry due to invalid response (attempt %s/3)", task_id, retry_count)
         return
         
     except Exception as e:
-        logger.error(f"LLM analysis failed for task {task_id}: {str(e)}")
+        logger.error("LLM analysis failed for task %s: %s", task_id, e)
         raise
     
-    # Step 3: Save AnalysisResult (Requirement 1.5)
-    analysis_result = AnalysisResult(
-        task_id=task_id,
-        user_id=user_id,
-        communication_score=skill_scores.communication,
-        emotional_intelligence_score=skill_scores.emotional_intelligence,
-        critical_thinking_score=skill_scores.critical_thinking,
-        time_management_score=skill_scores.time_management,
-        leadership_score=skill_scores.leadership,
-        strengths=[],
-        weaknesses=[],
-        feedback=skill_scores.feedback or ""
-    )
-    db.add(analysis_result)
-    await db.flush()
+    # Last cancellation point: once writing starts the task runs to its commit
+    _time_left(deadline)
     
-    # Step 4: Update SoftSkillsProfile through ProfileService (Requirement 2.1)
-    profile_service = ProfileService()
+    # Step 3: Update SoftSkillsProfile through ProfileService (Requirement 2.1)
     weight = 0.3  # Give 30% weight to new scores, 70% to historical
     
     profile = await profile_service.update_profile(
@@ -268,42 +225,45 @@ async def _process_analysis_with_db(
     )
 
     strengths_weaknesses = await profile_service.identify_strengths_weaknesses(profile)
-    analysis_result.strengths = strengths_weaknesses.strengths
-    analysis_result.weaknesses = strengths_weaknesses.weaknesses
+    
+    # Step 4: Save AnalysisResult (Requirement 1.5). Built after the profile update so
+    # the row is inserted once with its final strengths and weaknesses; it is flushed
+    # with the plan check's first query (which counts it) or the final commit.
+    analysis_result = AnalysisResult(
+        task_id=task_id,
+        user_id=user_id,
+        communication_score=skill_scores.communication,
+        emotional_intelligence_score=skill_scores.emotional_intelligence,
+        critical_thinking_score=skill_scores.critical_thinking,
+        time_management_score=skill_scores.time_management,
+        leadership_score=skill_scores.leadership,
+        strengths=strengths_weaknesses.strengths,
+        weaknesses=strengths_weaknesses.weaknesses,
+        feedback=skill_scores.feedback or ""
+    )
+    db.add(analysis_result)
 
     # Persist per-response feedback where relevant
-    if response_type == "test":
-        result_id = response_data.get("result_id")
-        if result_id:
-            result_row = await db.execute(
-                select(UserTestResult).where(UserTestResult.id == int(result_id))
-            )
-            test_result = result_row.scalar_one_or_none()
-            if test_result:
-                test_result.ai_analysis = analysis_result.feedback
-    elif response_type == "case":
-        solution_id = response_data.get("solution_id")
-        if solution_id:
-            solution_row = await db.execute(
-                select(CaseSolution).where(CaseSolution.id == int(solution_id))
-            )
-            case_solution = solution_row.scalar_one_or_none()
-            if case_solution:
-                case_solution.analysis_task_id = task_id
+    if persist_feedback is not None:
+        persist_feedback(analysis_result)
     
-    logger.info(f"Profile updated for user {user_id}")
+    logger.info("Profile updated for user %s", user_id)
     
-    # Step 5: Check if development plan generation is needed (Requirement 3.1)
-    plan_service = PlanService()
+    # Step 5: Check if development plan generation is needed (Requirement 3.1).
+    # Optional work: skipped when out of time, the next analysis checks again.
     try:
+        _time_left(deadline)
         new_plan = await plan_service.check_and_generate_plan(
             user_id=user_id,
             profile=profile,
-            db=db
+            db=db,
+            deadline=deadline
         )
 
         if new_plan:
-            logger.info(f"New development plan {new_plan.id} generated for user {user_id}")
+            logger.info("New development plan %s generated for user %s", new_plan.id, user_id)
+    except asyncio.TimeoutError:
+        logger.warning("Skipping plan check after analysis task %s: deadline reached", task_id)
     except Exception as e:
         logger.error(
             f"Plan generation failed after analysis task {task_id} (user_id={user_id}): {str(e)}",
@@ -311,11 +271,226 @@ async def _process_analysis_with_db(
         )
     
     # Update task status to completed
-    task.status = "completed"
-    task.completed_at = datetime.now(timezone.utc)
+    await db.execute(
+        update(AnalysisTask)
+        .where(AnalysisTask.id == task_id)
+        .values(status="completed", completed_at=datetime.now(timezone.utc))
+    )
     await db.commit()
     
-    logger.info(f"Analysis task {task_id} completed successfully")
+    logger.info("Analysis task %s completed successfully", task_id)
+
+
+# Persists analysis feedback onto the analysed response row
+FeedbackWriter = Callable[[AnalysisResult], None]
+
+
+def _simhash(text: str) -> int:
+    words = _WORD_RE.findall(text.lower())
+    features = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+    weights = [0] * 64
+    for feature in features:
+        digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if digest >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+async def _analyze_free_text(
+    user_id: int,
+    text: str,
+    context: Optional[str],
+    llm_service: LLMService,
+    deadline: float
+) -> SkillScores:
+    """
+    Analyze free text, reusing the user's recent analysis of a near-duplicate text.
+    
+    Requirements: 1.1, 1.3, 1.5
+    """
+    fingerprint = _simhash(text)
+    recent = _RECENT_ANALYSES.get(user_id)
+    if recent is not None:
+        _RECENT_ANALYSES.move_to_end(user_id)
+        for previous, previous_context, previous_scores in reversed(recent):
+            if previous_context == context and (previous ^ fingerprint).bit_count() <= _NEAR_DUPLICATE_MAX_BITS:
+                logger.info("Reusing analysis of a near-duplicate text for user %s", user_id)
+                return previous_scores.model_copy()
+    
+    skill_scores = await _call_llm(
+        lambda: llm_service.analyze_communication(text=text, context=context),
+        deadline
+    )
+    
+    if recent is None:
+        recent = _RECENT_ANALYSES[user_id] = deque(maxlen=_RECENT_ANALYSES_PER_USER)
+        if len(_RECENT_ANALYSES) > _RECENT_ANALYSES_MAX_USERS:
+            _RECENT_ANALYSES.popitem(last=False)
+    recent.append((fingerprint, context, skill_scores.model_copy()))
+    return skill_scores
+
+
+async def _analyze_chat_response(
+    user_id: int,
+    response_data: Dict[str, Any],
+    llm_service: LLMService,
+    db: AsyncSession,
+    deadline: float
+) -> Tuple[SkillScores, Optional[FeedbackWriter]]:
+    """
+    Analyze a chat message; voice messages get a sarcasm-aware context.
+    
+    Requirements: 1.1, 1.5
+    """
+    text_to_analyze = None
+    context = None
+    
+    message_id = response_data.get("response_id")
+    if message_id:
+        # The voice flag is an EXISTS in the same query, so the audio blob is never read
+        msg_result = await db.execute(
+            select(ChatMessage, _HAS_AUDIO).where(ChatMessage.id == message_id)
+        )
+        msg_row = msg_result.one_or_none()
+        if msg_row:
+            chat_message, has_audio = msg_row
+            text_to_analyze = chat_message.message
+            context = (
+                "Анализ голосового сообщения пользователя (текст распознан из аудио; учитывай сарказм/иронию)"
+                if has_audio
+                else "Анализ текстового сообщения пользователя"
+            )
+    else:
+        text_to_analyze = response_data.get("message")
+        context = "Анализ текстового сообщения пользователя"
+    
+    if not text_to_analyze:
+        raise ValueError("No text to analyze for chat")
+    
+    skill_scores = await _analyze_free_text(user_id, text_to_analyze, context, llm_service, deadline)
+    return skill_scores, None
+
+
+async def _analyze_test_response(
+    user_id: int,
+    response_data: Dict[str, Any],
+    llm_service: LLMService,
+    db: AsyncSession,
+    deadline: float
+) -> Tuple[SkillScores, Optional[FeedbackWriter]]:
+    """
+    Analyze test answers and write the feedback to the test result.
+    
+    Requirements: 1.2, 1.5
+    """
+    test_id = response_data.get("test_id")
+    result_id = response_data.get("result_id")
+    
+    answers = response_data.get("answers", {})
+    test_result = None
+    if result_id:
+        # The test and its questions come with the result for the prompt below
+        result_row = await db.execute(
+            select(UserTestResult)
+            .options(joinedload(UserTestResult.test).selectinload(Test.questions))
+            .where(UserTestResult.id == int(result_id))
+        )
+        test_result = result_row.scalar_one_or_none()
+        if test_result:
+            answers = test_result.details or {}
+    
+    questions = []
+    if test_id:
+        if test_result is not None and test_result.test_id == int(test_id):
+            test_obj = test_result.test
+        else:
+            test_row = await db.execute(
+                select(Test).options(selectinload(Test.questions)).where(Test.id == int(test_id))
+            )
+            test_obj = test_row.scalar_one_or_none()
+        if test_obj and test_obj.questions:
+            questions = [
+                {"id": q.id, "text": q.text}
+                for q in test_obj.questions
+            ]
+    
+    if not questions:
+        questions = [
+            {"id": k, "text": f"Question {k}"}
+            for k in answers.keys()
+        ]
+    
+    skill_scores = await _call_llm(
+        lambda: llm_service.analyze_test_answers(
+            test_type=f"test_{test_id}",
+            questions=questions,
+            answers=answers
+        ),
+        deadline
+    )
+    
+    if test_result is None:
+        return skill_scores, None
+    
+    def persist_feedback(analysis_result: AnalysisResult) -> None:
+        test_result.ai_analysis = analysis_result.feedback
+    
+    return skill_scores, persist_feedback
+
+
+async def _analyze_case_response(
+    user_id: int,
+    response_data: Dict[str, Any],
+    llm_service: LLMService,
+    db: AsyncSession,
+    deadline: float
+) -> Tuple[SkillScores, Optional[FeedbackWriter]]:
+    """
+    Analyze a case solution and link the solution to its analysis task.
+    
+    Requirements: 1.3, 1.5
+    """
+    text_to_analyze = None
+    case_solution = None
+    
+    solution_id = response_data.get("solution_id")
+    case_id = response_data.get("case_id")
+    if solution_id:
+        solution_row = await db.execute(
+            select(CaseSolution).where(CaseSolution.id == int(solution_id))
+        )
+        case_solution = solution_row.scalar_one_or_none()
+        if case_solution:
+            text_to_analyze = case_solution.solution
+    else:
+        text_to_analyze = response_data.get("solution")
+    
+    if not text_to_analyze:
+        raise ValueError("No text to analyze for case")
+    
+    skill_scores = await _analyze_free_text(
+        user_id, text_to_analyze, f"Анализ решения кейса ID {case_id}", llm_service, deadline
+    )
+    
+    if case_solution is None:
+        return skill_scores, None
+    
+    def persist_feedback(analysis_result: AnalysisResult) -> None:
+        case_solution.analysis_task_id = analysis_result.task_id
+    
+    return skill_scores, persist_feedback
+
+
+# response_type -> handler that loads the response, analyzes it and returns the
+# scores together with an optional writer for per-response feedback
+_ANALYSIS_HANDLERS: Dict[
+    str,
+    Callable[[int, Dict[str, Any], LLMService, AsyncSession, float], Awaitable[Tuple[SkillScores, Optional[FeedbackWriter]]]]
+] = {
+    "chat": _analyze_chat_response,
+    "test": _analyze_test_response,
+    "case": _analyze_case_response,
+}
 
 
 async def _mark_task_failed(
@@ -329,19 +504,39 @@ async def _mark_task_failed(
     Requirements: 6.1
     """
     try:
-        result = await db.execute(
-            select(AnalysisTask).where(AnalysisTask.id == task_id)
-        )
-        task = result.scalar_one_or_none()
-        
-        if task:
-            task.status = "failed"
-            task.error_message = error_message
-            task.retry_count += 1
-            await db.commit()
-            logger.info(f"Marked task {task_id} as failed (retry_count={task.retry_count})")
+        retry_count = await _record_task_failure(task_id, error_message, db)
+        if retry_count is not None:
+            logger.info("Marked task %s as failed (retry_count=%s)", task_id, retry_count)
     except Exception as e:
-        logger.error(f"Failed to mark task {task_id} as failed: {str(e)}")
+        logger.error("Failed to mark task %s as failed: %s", task_id, e)
+
+
+async def _record_task_failure(
+    task_id: str,
+    error_message: str,
+    db: AsyncSession
+) -> Optional[int]:
+    """
+    Set a task to failed and bump its retry counter in one UPDATE, then commit.
+    
+    Returns:
+        The new retry_count, or None if the task does not exist
+        
+    Requirements: 6.1
+    """
+    result = await db.execute(
+        update(AnalysisTask)
+        .where(AnalysisTask.id == task_id)
+        .values(
+            status="failed",
+            error_message=error_message,
+            retry_count=AnalysisTask.retry_count + 1
+        )
+        .returning(AnalysisTask.retry_count)
+    )
+    retry_count = result.scalar_one_or_none()
+    await db.commit()
+    return retry_count
 
 
 async def generate_development_plan_background(
@@ -366,8 +561,9 @@ async def generate_development_plan_background(
     Requirements: 3.2, 3.3, 3.4, 3.5, 7.3
     """
     logger.info(
-        f"Background plan generation task started: user_id={user_id}, "
-        f"profile_id={profile_id}"
+        "Background plan generation task started: user_id=%s, profile_id=%s",
+        user_id,
+        profile_id,
     )
     
     # Create a new database session for this background task
@@ -380,7 +576,7 @@ async def generate_development_plan_background(
             )
             
         except asyncio.TimeoutError:
-            logger.error(f"Plan generation for user {user_id} timed out after 30 seconds")
+            logger.error("Plan generation for user %s timed out after 30 seconds", user_id)
             
         except Exception as e:
             logger.error(f"Error generating plan for user {user_id}: {str(e)}", exc_info=True)
@@ -403,11 +599,10 @@ async def _generate_plan_with_db(
     profile = result.scalar_one_or_none()
     
     if not profile:
-        logger.error(f"Profile {profile_id} not found for user {user_id}")
+        logger.error("Profile %s not found for user %s", profile_id, user_id)
         return
     
     # Step 2-6: Use PlanService to handle the rest
-    plan_service = PlanService()
     
     new_plan = await plan_service.check_and_generate_plan(
         user_id=user_id,
@@ -417,9 +612,9 @@ async def _generate_plan_with_db(
     
     if new_plan:
         await db.commit()
-        logger.info(f"Development plan {new_plan.id} generated successfully for user {user_id}")
+        logger.info("Development plan %s generated successfully for user %s", new_plan.id, user_id)
     else:
-        logger.info(f"No plan generation needed for user {user_id}")
+        logger.info("No plan generation needed for user %s", user_id)
 
 
 async def retry_failed_analyses_background() -> None:
@@ -449,70 +644,138 @@ async def retry_failed_analyses_background() -> None:
             )
             failed_tasks = result.scalars().all()
             
-            logger.info(f"Found {len(failed_tasks)} failed tasks to retry")
+            logger.info("Found %s failed tasks to retry", len(failed_tasks))
+            if not failed_tasks:
+                logger.info("Retry task completed")
+                return
             
-            for task in failed_tasks:
-                logger.info(f"Retrying task {task.id} (attempt {task.retry_count + 1}/3)")
-                
-                # Reconstruct response_data based on response_type
-                response_data = {}
-                
-                if task.response_type == "chat":
-                    # Get the chat message
-                    msg_result = await db.execute(
-                        select(ChatMessage).where(ChatMessage.analysis_task_id == task.id)
-                    )
-                    chat_message = msg_result.scalar_one_or_none()
-                    if chat_message:
-                        response_data = {
-                            "message": chat_message.message,
-                            "response_id": chat_message.id
-                        }
-                elif task.response_type == "test":
-                    result_row = await db.execute(
-                        select(UserTestResult).where(UserTestResult.id == int(task.response_id))
-                    )
-                    test_result = result_row.scalar_one_or_none()
-                    if test_result:
-                        response_data = {
-                            "test_id": test_result.test_id,
-                            "result_id": test_result.id,
-                            "answers": test_result.details or {}
-                        }
-                elif task.response_type == "case":
-                    solution_row = await db.execute(
-                        select(CaseSolution).where(CaseSolution.id == int(task.response_id))
-                    )
-                    case_solution = solution_row.scalar_one_or_none()
-                    if case_solution:
-                        response_data = {
-                            "case_id": case_solution.test_id,
-                            "solution_id": case_solution.id,
-                            "solution": case_solution.solution
-                        }
-                
-                # Reset task status to pending
-                task.status = "pending"
-                task.error_message = None
-                await db.commit()
-                
-                # Retry processing
-                try:
-                    await asyncio.wait_for(
-                        _process_analysis_with_db(
-                            task.id,
-                            task.user_id,
-                            task.response_type,
-                            response_data,
-                            db
-                        ),
-                        timeout=30.0
-                    )
-                except Exception as e:
-                    logger.error(f"Retry failed for task {task.id}: {str(e)}")
-                    await _mark_task_failed(task.id, f"Retry failed: {str(e)}", db)
-            
-            logger.info("Retry task completed")
+            # Reconstruct response_data for all tasks with one query per response type
+            response_data_by_task = await _load_retry_response_data(failed_tasks, db)
             
+            # Reset all of them to pending at once. Tasks claimed by another worker since
+            # the select are no longer failed and are left alone.
+            task_ids = [task.id for task in failed_tasks]
+            reset_result = await db.execute(
+                update(AnalysisTask)
+                .where(
+                    and_(
+                        AnalysisTask.id.in_(task_ids),
+                        AnalysisTask.status == "failed"
+                    )
+                )
+                .values(status="pending", error_message=None)
+                .returning(AnalysisTask.id)
+            )
+            reset_ids = set(reset_result.scalars().all())
+            await db.commit()
+            failed_tasks = [task for task in failed_tasks if task.id in reset_ids]
         except Exception as e:
             logger.error(f"Error in retry_failed_analyses_background: {str(e)}", exc_info=True)
+            return
+    
+    # Retry processing. Users are handled concurrently, each on its own session;
+    # one user's tasks stay sequential because they update the same profile and plan.
+    tasks_by_user: Dict[int, List[AnalysisTask]] = defaultdict(list)
+    for task in failed_tasks:
+        tasks_by_user[task.user_id].append(task)
+    
+    semaphore = asyncio.Semaphore(_RETRY_CONCURRENCY)
+    
+    async def _retry_user_tasks(user_tasks: List[AnalysisTask]) -> None:
+        async with semaphore:
+            for task in user_tasks:
+                await _retry_task(task, response_data_by_task.get(task.id, {}))
+    
+    await asyncio.gather(*(_retry_user_tasks(user_tasks) for user_tasks in tasks_by_user.values()))
+    
+    logger.info("Retry task completed")
+
+
+async def _load_retry_response_data(
+    failed_tasks: List[AnalysisTask],
+    db: AsyncSession
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Rebuild response_data for failed tasks, keyed by task ID.
+    
+    Requirements: 6.2
+    """
+    tasks_by_type: Dict[str, List[AnalysisTask]] = defaultdict(list)
+    for task in failed_tasks:
+        tasks_by_type[task.response_type].append(task)
+    
+    response_data_by_task: Dict[str, Dict[str, Any]] = {}
+    
+    chat_tasks = tasks_by_type.get("chat")
+    if chat_tasks:
+        msg_result = await db.execute(
+            select(ChatMessage).where(
+                ChatMessage.analysis_task_id.in_([task.id for task in chat_tasks])
+            )
+        )
+        for chat_message in msg_result.scalars():
+            response_data_by_task[chat_message.analysis_task_id] = {
+                "message": chat_message.message,
+                "response_id": chat_message.id
+            }
+    
+    test_tasks = tasks_by_type.get("test")
+    if test_tasks:
+        result_rows = await db.execute(
+            select(UserTestResult).where(
+                UserTestResult.id.in_({int(task.response_id) for task in test_tasks})
+            )
+        )
+        test_results = {test_result.id: test_result for test_result in result_rows.scalars()}
+        for task in test_tasks:
+            test_result = test_results.get(int(task.response_id))
+            if test_result:
+                response_data_by_task[task.id] = {
+                    "test_id": test_result.test_id,
+                    "result_id": test_result.id,
+                    "answers": test_result.details or {}
+                }
+    
+    case_tasks = tasks_by_type.get("case")
+    if case_tasks:
+        solution_rows = await db.execute(
+            select(CaseSolution).where(
+                CaseSolution.id.in_({int(task.response_id) for task in case_tasks})
+            )
+        )
+        case_solutions = {case_solution.id: case_solution for case_solution in solution_rows.scalars()}
+        for task in case_tasks:
+            case_solution = case_solutions.get(int(task.response_id))
+            if case_solution:
+                response_data_by_task[task.id] = {
+                    "case_id": case_solution.test_id,
+                    "solution_id": case_solution.id,
+                    "solution": case_solution.solution
+                }
+    
+    return response_data_by_task
+
+
+async def _retry_task(task: AnalysisTask, response_data: Dict[str, Any]) -> None:
+    """
+    Retry one failed analysis task on its own database session.
+    
+    Requirements: 6.1, 6.2
+    """
+    logger.info("Retrying task %s (attempt %s/3)", task.id, task.retry_count + 1)
+    
+    async with AsyncSessionLocal() as db:
+        try:
+            deadline = asyncio.get_running_loop().time() + _RETRY_TIMEOUT_SECONDS
+            await _process_analysis_with_db(
+                task.id,
+                task.user_id,
+                task.response_type,
+                response_data,
+                db,
+                deadline
+            )
+        except Exception as e:
+            logger.error("Retry failed for task %s: %s", task.id, e)
+            await db.rollback()
+            await _mark_task_failed(task.id, f"Retry failed: {str(e)}", db)
@@ -0,0 +1,126 @@
+"""
+Smoke tests for LLMService test-answer chunking.
+
+This script is intentionally framework-free so it can run with:
+`python test_llm_service.py`
+"""
+
+import asyncio
+
+from app.schemas.analysis import SkillScores
+from app.services import llm_service as llm_module
+from app.services.llm_service import LLMRateLimitError, LLMService
+
+_SKILLS = (
+    "communication",
+    "emotional_intelligence",
+    "critical_thinking",
+    "time_management",
+    "leadership",
+)
+
+
+def _questions(count):
+    return [{"id": idx, "text": f"Question {idx}"} for idx in range(1, count + 1)]
+
+
+def _service(chunk_scores, fail_on=None, max_requests_per_minute=60):
+    """
+    LLMService whose per-chunk analysis returns ``chunk_scores[first question id]``.
+
+    Records every call and the peak number of chunks in flight on ``service.calls``
+    and ``service.peak``.
+    """
+    llm_module._ANALYSIS_CACHE.clear()
+    service = LLMService(max_requests_per_minute=max_requests_per_minute)
+    service.calls = []
+    service.peak = 0
+    in_flight = 0
+
+    async def fake_analyze(test_type, questions, answers):
+        nonlocal in_flight
+        first_id = questions[0]["id"]
+        service.calls.append(first_id)
+        in_flight += 1
+        service.peak = max(service.peak, in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if fail_on is not None and first_id in fail_on:
+                fail_on.discard(first_id)
+                raise LLMRateLimitError("slow down")
+            score, feedback = chunk_scores[first_id]
+            return SkillScores(**{skill: score for skill in _SKILLS}, feedback=feedback)
+        finally:
+            in_flight -= 1
+
+    service._analyze_test_answers = fake_analyze
+    return service
+
+
+def test_chunk_scores_are_merged_by_question_count():
+    service = _service({1: (90, "first"), 11: (60, "second"), 21: (30, "third")})
+
+    scores = asyncio.run(service._analyze_test_answers_in_chunks("test_1", _questions(25), {}))
+
+    # 25 questions -> chunks of 10/10/5: (90*10 + 60*10 + 30*5) / 25
+    for skill in _SKILLS:
+        assert getattr(scores, skill) == 66
+    assert scores.feedback == "- first\n- second\n- third"
+    assert sorted(service.calls) == [1, 11, 21]
+    assert service.peak <= LLMService.TEST_ANSWERS_CHUNK_CONCURRENCY
+
+
+def test_retry_after_partial_failure_only_resends_failed_chunks():
+    service = _service({1: (90, "a"), 11: (60, "b"), 21: (30, "c")}, fail_on={11})
+
+    try:
+        asyncio.run(service._analyze_test_answers_in_chunks("test_1", _questions(25), {}))
+    except LLMRateLimitError:
+        pass
+    else:
+        raise AssertionError("expected the failed chunk to surface")
+
+    service.calls.clear()
+    scores = asyncio.run(service._analyze_test_answers_in_chunks("test_1", _questions(25), {}))
+
+    assert service.calls == [11]
+    assert scores.communication == 66
+
+
+def test_chunks_need_rate_limit_room_for_all_requests():
+    service = _service({1: (90, None), 11: (60, None), 21: (30, None)}, max_requests_per_minute=2)
+
+    try:
+        asyncio.run(service._analyze_test_answers_in_chunks("test_1", _questions(25), {}))
+    except LLMRateLimitError:
+        pass
+    else:
+        raise AssertionError("expected the rate limit to reject three chunk requests")
+
+    assert service.calls == []
+
+
+def main():
+    tests = [
+        test_chunk_scores_are_merged_by_question_count,
+        test_retry_after_partial_failure_only_resends_failed_chunks,
+        test_chunks_need_rate_limit_room_for_all_requests,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"[OK] {test.__name__}")
+        except Exception as exc:
+            failed += 1
+            print(f"[FAIL] {test.__name__}: {exc}")
+
+    if failed:
+        raise SystemExit(1)
+
+    print("All LLM service smoke tests passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,8 @@ from app.schemas.plan import (
 )
 from app.services.plan_service import PlanService
 
+# The helpers under test are stateless, so one service instance is shared.
+_SERVICE = PlanService()
 
 def _build_content(material_ids):
     return DevelopmentPlanContent(
@@ -50,7 +52,7 @@ def _build_content(material_ids):
 
 
 def test_identify_weaknesses():
-    service = PlanService()
+    service = _SERVICE
     profile = SoftSkillsProfile(
         id=1,
         user_id=1,
@@ -67,9 +69,8 @@ def test_identify_weaknesses():
     assert all(isinstance(item, str) and item for item in weaknesses), "Weakness names must be non-empty strings"
 
 
-def test_check_material_uniqueness():
-    service = PlanService()
-    previous_plan = DevelopmentPlan(
+def _previous_plan_with_materials():
+    return DevelopmentPlan(
         id=1,
         user_id=1,
         generated_at=datetime.now(timezone.utc) - timedelta(days=7),
@@ -85,15 +86,21 @@ def test_check_material_uniqueness():
         },
     )
 
-    unique_enough = _build_content(["mat_1", "mat_3", "mat_4", "mat_5"])
-    not_unique_enough = _build_content(["mat_1", "mat_2", "mat_3"])
 
-    assert service._check_material_uniqueness(unique_enough, previous_plan) is True
-    assert service._check_material_uniqueness(not_unique_enough, previous_plan) is False
+def test_check_material_uniqueness_accepts_mostly_new_materials():
+    content = _build_content(["mat_1", "mat_3", "mat_4", "mat_5"])
+
+    assert _SERVICE._check_material_uniqueness(content, _previous_plan_with_materials()) is True
+
+
+def test_check_material_uniqueness_rejects_repeated_materials():
+    content = _build_content(["mat_1", "mat_2", "mat_3"])
+
+    assert _SERVICE._check_material_uniqueness(content, _previous_plan_with_materials()) is False
 
 
 def test_assign_tests_to_materials_avoids_repeats_with_skill_alternatives():
-    service = PlanService()
+    service = _SERVICE
 
     materials = [
         {"id": "mat_comm_1", "skill": "communication"},
@@ -120,8 +127,14 @@ def test_assign_tests_to_materials_avoids_repeats_with_skill_alternatives():
     assert mapping.get("mat_lead_1") == 3
 
 
+def test_material_domain_strips_only_www_prefix():
+    assert _SERVICE._material_domain("https://www.mindtools.com/a") == "mindtools.com"
+    assert _SERVICE._material_domain("https://web.dev/learn") == "web.dev"
+    assert _SERVICE._material_domain("https://w3schools.com/") == "w3schools.com"
+
+
 def test_collect_block_achievements_merges_history():
-    service = PlanService()
+    service = _SERVICE
     plans = [
         DevelopmentPlan(
             id=10,
@@ -158,12 +171,99 @@ def test_collect_block_achievements_merges_history():
     assert "Блок 2" in titles
 
 
+class _FullSync(Exception):
+    pass
+
+
+class _MarkerOnlySession:
+    """Answers the tracking marker query; any further query means a full sync ran."""
+
+    def __init__(self, marker):
+        self.marker = marker
+        self.executed = 0
+
+    async def execute(self, statement):
+        self.executed += 1
+        if self.executed > 1:
+            raise _FullSync()
+        return _MarkerRow(self.marker)
+
+
+class _MarkerRow:
+    def __init__(self, values):
+        self.values = values
+
+    def one(self):
+        return self.values
+
+
+def _synced_plan(marker):
+    content = {
+        "target_difficulty": "beginner",
+        "materials": [{"id": "mat_1", "skill": "leadership"}],
+        "tasks": [{"id": "task_1", "skill": "leadership", "status": "pending"}],
+        "material_test_map": {"mat_1": 1},
+        "material_progress": {
+            "mat_1": {
+                "linked_test_id": 1,
+                "article_opened": True,
+                "article_opened_at": None,
+                "test_completed": False,
+                "test_completed_at": None,
+                "percentage": 50.0,
+            }
+        },
+        "block_achievements": [],
+        "tracking_sync_marker": [str(value) for value in marker],
+    }
+    content["final_stage"] = {
+        "final_test_id": 10,
+        "final_simulation_id": 11,
+        "unlocked": False,
+        "achievement_title": _SERVICE._build_block_achievement_title(content),
+    }
+    return DevelopmentPlan(id=1, user_id=1, generated_at=datetime.now(timezone.utc), content=content)
+
+
+def test_sync_plan_tracking_cache_hit_miss_and_reset():
+    marker = ("2026-01-10 10:00:00+00:00", "None", "12", "2026-01-09 08:00:00+00:00")
+
+    # Hit: unchanged marker, only the marker query runs
+    plan = _synced_plan(marker)
+    db = _MarkerOnlySession(marker)
+    tracking = asyncio.run(_SERVICE.sync_plan_tracking(plan, 1, db))
+    assert db.executed == 1
+    assert tracking["material_progress"]["mat_1"]["linked_test_id"] == 1
+
+    # Miss: an admin edit bumped a test's updated_at
+    db = _MarkerOnlySession(marker[:3] + ("2026-01-11 09:00:00+00:00",))
+    try:
+        asyncio.run(_SERVICE.sync_plan_tracking(plan, 1, db))
+    except _FullSync:
+        pass
+    else:
+        raise AssertionError("catalog change must trigger a full sync")
+
+    # Invalidation: plan materials were edited
+    _SERVICE.reset_tracking_cache(plan.content)
+    db = _MarkerOnlySession(marker)
+    try:
+        asyncio.run(_SERVICE.sync_plan_tracking(plan, 1, db))
+    except _FullSync:
+        pass
+    else:
+        raise AssertionError("reset_tracking_cache must trigger a full sync")
+
+
 def main():
     tests = [
         test_identify_weaknesses,
-        test_check_material_uniqueness,
+        test_check_material_uniqueness_accepts_mostly_new_materials,
+        test_check_material_uniqueness_rejects_repeated_materials,
         test_assign_tests_to_materials_avoids_repeats_with_skill_alternatives,
+        test_material_domain_strips_only_www_prefix,
         test_collect_block_achievements_merges_history,
+        test_sync_plan_tracking_cache_hit_miss_and_reset,
     ]
 
     failed = 0
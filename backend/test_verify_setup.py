@@ -0,0 +1,85 @@
+"""
+Smoke tests for the setup checks in app/core/verify.py.
+
+This script is intentionally framework-free so it can run with:
+`python test_verify_setup.py`
+"""
+
+import asyncio
+import os
+from contextlib import contextmanager
+from io import StringIO
+
+import app.core.config as config_module
+from app.core.config import Settings
+from app.core.verify import VerifyResult, verify_database
+
+_DATABASE_ENV_VARS = (
+    "DATABASE_URL",
+    "POSTGRES_SERVER",
+    "POSTGRES_USER",
+    "POSTGRES_PASSWORD",
+    "POSTGRES_DB",
+    "POSTGRES_PORT",
+)
+
+
+@contextmanager
+def _settings_from(**values):
+    """Use Settings built only from ``values`` (no .env, no database env vars)."""
+    saved_env = {name: os.environ.pop(name) for name in _DATABASE_ENV_VARS if name in os.environ}
+    saved_settings = config_module.settings
+    try:
+        config_module.settings = Settings(_env_file=None, **values)
+        yield config_module.settings
+    finally:
+        config_module.settings = saved_settings
+        os.environ.update(saved_env)
+
+
+def test_database_configured_only_when_set_explicitly():
+    with _settings_from() as settings:
+        assert settings.DATABASE_URL.endswith("@localhost:5432/softskills_db")
+        assert settings.database_configured is False
+    with _settings_from(DATABASE_URL="") as settings:
+        assert settings.database_configured is False
+    with _settings_from(DATABASE_URL="postgres://user@db.example.com/app") as settings:
+        assert settings.database_configured is True
+    with _settings_from(POSTGRES_SERVER="db") as settings:
+        assert settings.database_configured is True
+
+
+def test_database_probe_skipped_without_db_config():
+    out = StringIO()
+    with _settings_from():
+        db_ok = asyncio.run(verify_database(out))
+
+    assert db_ok is None
+    assert "[SKIP]" in out.getvalue()
+    assert "PostgreSQL connection" not in out.getvalue()
+    assert VerifyResult(deps_ok=True, env_ok=True, db_ok=db_ok).ok is False
+
+
+def main():
+    tests = [
+        test_database_configured_only_when_set_explicitly,
+        test_database_probe_skipped_without_db_config,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"[OK] {test.__name__}")
+        except Exception as exc:
+            failed += 1
+            print(f"[FAIL] {test.__name__}: {exc}")
+
+    if failed:
+        raise SystemExit(1)
+
+    print("All setup verification smoke tests passed.")
+
+
+if __name__ == "__main__":
+    main()